@@ -0,0 +1,138 @@
+"""Module contains the audit log of votes and authentication events.
+
+``audit()`` logs one event with its ids on the ``mysite.audit`` logger. In
+``LOGGING`` that logger goes to an ``AsyncRotatingFileHandler``: the request
+thread only turns the record into a JSON line and puts it on a queue, and a
+``QueueListener`` thread writes it to a file (or stderr). A
+``SamplingFilter`` keeps a fraction of high-volume events.
+"""
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+logger = logging.getLogger("mysite.audit")
+
+
+def audit(event: str, level: int = logging.INFO, **fields):
+    """Log ``event`` with ``fields`` (ids rather than text) on the audit logger."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'audit': {'event': event, **fields}})
+
+
+class JSONFormatter(logging.Formatter):
+    """Formatter that writes each record as one JSON object, with the fields given to ``audit()``."""
+
+    def format(self, record):
+        """Format ``record`` as a JSON line."""
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        if hasattr(record, 'audit'):
+            data.update(record.audit)
+        else:
+            data['message'] = record.getMessage()
+        if getattr(record, 'sample_rate', 1) < 1:
+            data['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Filter that keeps each event with the rate set for it in ``rates``, e.g. ``{'vote': 0.1}``.
+
+    Kept records carry their ``sample_rate``, so counts can be scaled back up.
+    Events without a rate, and warnings and errors, are always kept.
+    """
+
+    def __init__(self, rates: dict = None, name: str = ''):
+        """Initialize filter with the rate of each event, from 0 (drop all) to 1 (keep all)."""
+        super().__init__(name)
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        """Tell whether to keep ``record``."""
+        rate = self.rates.get(getattr(record, 'audit', {}).get('event', record.msg), 1)
+        if rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class AsyncRotatingFileHandler(QueueHandler):
+    """Handler that queues formatted records for a listener thread writing a file.
+
+    Several worker processes must not rotate one file, so rotation at ``maxBytes``
+    only happens when ``filename`` contains ``{pid}``, which gives each process
+    its own file. A shared file is reopened when it is moved, for rotation by an
+    outside tool such as logrotate. Without ``filename`` the listener writes to
+    stderr. When the queue is full, records are dropped and counted in
+    ``dropped`` rather than blocking requests.
+
+    A forked child (e.g. a worker of ``gunicorn --preload``) does not inherit
+    the listener thread, so it starts its own with an empty queue.
+    """
+
+    def __init__(self, filename: str = '', maxBytes: int = 0, backupCount: int = 0, encoding: str = 'utf-8',
+                 queue_size: int = 10000):
+        """Initialize handler and start its listener thread."""
+        super().__init__(queue.Queue(queue_size))
+        self.filename = filename
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.encoding = encoding
+        self.dropped = 0
+        self._start()
+        os.register_at_fork(after_in_child=self._restart)
+
+    def _open_sink(self):
+        """Create the handler the listener writes to."""
+        if not self.filename:
+            return logging.StreamHandler(sys.stderr)
+        if '{pid}' in self.filename:
+            return RotatingFileHandler(self.filename.format(pid=os.getpid()), maxBytes=self.maxBytes,
+                                       backupCount=self.backupCount, encoding=self.encoding, delay=True)
+        return WatchedFileHandler(self.filename, encoding=self.encoding, delay=True)
+
+    def _start(self):
+        """Start a listener thread writing to a new sink."""
+        self.listener = QueueListener(self.queue, self._open_sink())
+        self.listener.start()
+        self.listening = True
+
+    def _restart(self):
+        """Replace the queue and the listener thread lost by forking, if the handler was not closed."""
+        if self.listening:
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._start()
+
+    def enqueue(self, record):
+        """Queue ``record``, or drop it if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until the listener wrote every queued record."""
+        if self.listening:
+            self.queue.join()
+
+    def close(self):
+        """Stop the listener after it wrote every queued record, then close the sink.
+
+        ``logging.shutdown()`` calls this when the process exits.
+        """
+        if self.listening:
+            self.listening = False
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+        super().close()
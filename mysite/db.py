@@ -0,0 +1,141 @@
+"""Module contains read-replica routing and health checks of persistent database connections.
+
+With ``DATABASE_READ_REPLICA`` on, ``PrimaryReplicaRouter`` sends reads to the
+``replica`` database and writes to ``default``. ``ReplicaRoutingMiddleware``
+decides per request:
+
+* GET and HEAD requests (index, details, results) read from the replica.
+* Other requests (vote, signup, login) read and write the primary.
+* A request that writes reads the primary for the rest of the request, and the
+  client gets a cookie that keeps its reads on the primary for
+  ``DATABASE_REPLICA_STICKY_SECONDS``, so a voter sees their vote before the
+  replica has caught up.
+
+With ``SQLITE_PRODUCTION`` on, every new SQLite connection is tuned for several
+worker processes writing at once (see ``configure_sqlite``). The hooks in this
+module are connected when the router or the middleware is first loaded.
+"""
+import contextlib
+import contextvars
+import math
+import time
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+STICKY_COOKIE = 'db_primary'
+
+_use_primary = contextvars.ContextVar('use_primary', default=False)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def replica_enabled() -> bool:
+    """Check that a replica is configured and reads may use it."""
+    return getattr(settings, 'DATABASE_READ_REPLICA', False) and REPLICA in settings.DATABASES
+
+
+@contextlib.contextmanager
+def route_reads(use_primary: bool):
+    """Route reads inside the block to the primary or the replica, and track writes."""
+    primary_token = _use_primary.set(use_primary)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _use_primary.reset(primary_token)
+        _wrote.reset(wrote_token)
+
+
+def wrote() -> bool:
+    """Check whether the current block wrote to the primary."""
+    return _wrote.get()
+
+
+class PrimaryReplicaRouter:
+    """Database router that reads from the replica unless the current request must see the primary."""
+
+    def db_for_read(self, model, **hints):
+        """Read from the replica, or from the primary after a write or for pinned requests."""
+        if not replica_enabled() or _use_primary.get() or _wrote.get():
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary, and read from it for the rest of the request."""
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations across aliases, they hold the same data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate every alias, so a stand-in replica has the same tables."""
+        return True
+
+
+def _mark_used(execute, sql, params, many, context):
+    """Run a query and remember when its connection last worked."""
+    result = execute(sql, params, many, context)
+    context['connection'].health_checked_at = time.monotonic()
+    return result
+
+
+@receiver(connection_created)
+def track_use(connection, **kwargs):
+    """Note the time of each query on a new connection, which ``check_connections`` takes as a health check."""
+    if _mark_used not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_mark_used)
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Close persistent connections that stopped working, so the request opens new ones.
+
+    Django only drops a persistent connection when it is too old or after an
+    error; a connection broken while idle (database restart, failover) would
+    otherwise fail the next request. Only connections without a query for
+    ``DATABASE_HEALTH_CHECK_IDLE`` seconds are checked, so busy workers (and
+    requests answered from the page cache) do not run an extra query each time.
+    Set ``DATABASE_HEALTH_CHECKS`` off to skip.
+    """
+    if not getattr(settings, 'DATABASE_HEALTH_CHECKS', True):
+        return
+    now = time.monotonic()
+    idle = getattr(settings, 'DATABASE_HEALTH_CHECK_IDLE', 0)
+    for connection in connections.all():
+        if connection.connection is None or connection.settings_dict['CONN_MAX_AGE'] == 0 \
+                or connection.in_atomic_block or now - getattr(connection, 'health_checked_at', -math.inf) < idle:
+            continue
+        if connection.is_usable():
+            connection.health_checked_at = now
+        else:
+            connection.close()
+
+
+@receiver(connection_created)
+def configure_sqlite(connection, **kwargs):
+    """Apply the SQLite production profile to a new connection.
+
+    * WAL journal: readers no longer block the writer and the writer no longer
+      blocks readers, so only writes wait for each other.
+    * ``synchronous=NORMAL``: with WAL, commits no longer wait for an fsync;
+      a power loss can lose the last commits but not corrupt the database.
+    * ``busy_timeout``: a writer waits up to ``SQLITE_BUSY_TIMEOUT`` milliseconds
+      for the lock instead of failing with "database is locked".
+    * ``mmap_size`` and ``cache_size``: read pages through memory mapping and keep
+      more of them in each connection's cache.
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_PRODUCTION', False) \
+            or connection.is_in_memory_db():
+        return
+    # The raw connection skips query logging and execute wrappers, these are not queries of the request.
+    for pragma in ('journal_mode=WAL', 'synchronous=NORMAL',
+                   f'busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}',
+                   f'mmap_size={int(settings.SQLITE_MMAP_SIZE)}',
+                   f'cache_size=-{int(settings.SQLITE_CACHE_SIZE)}'):
+        connection.connection.execute(f'PRAGMA {pragma}')
@@ -0,0 +1,18 @@
+"""Module contains forms of the accounts pages."""
+from django.contrib.auth.forms import AuthenticationForm
+from django.core.exceptions import ValidationError
+
+
+class RateLimitedAuthenticationForm(AuthenticationForm):
+    """Login form that tells the user when the login was refused by the rate limiter."""
+
+    error_messages = {
+        **AuthenticationForm.error_messages,
+        'rate_limited': "Too many failed login attempts. Please try again later.",
+    }
+
+    def get_invalid_login_error(self):
+        """Explain a refused login instead of reporting a wrong password."""
+        if getattr(self.request, 'login_rate_limited', False):
+            return ValidationError(self.error_messages['rate_limited'], code='rate_limited')
+        return super().get_invalid_login_error()
@@ -0,0 +1,104 @@
+"""Module contains password hashers whose cost is set in settings.
+
+``PASSWORD_HASHER`` in the environment picks the hasher for new passwords; the
+others stay in ``PASSWORD_HASHERS`` so existing hashes still verify, and are
+upgraded the next time their user logs in.
+"""
+import base64
+import hashlib
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, BasePasswordHasher, mask_hash
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """Hasher using the memory-hard scrypt function from the standard library.
+
+    The encoded format matches Django 4.0's ``ScryptPasswordHasher``, so hashes
+    keep working after an upgrade. ``PASSWORD_SCRYPT_WORK_FACTOR`` sets N.
+    """
+
+    algorithm = 'scrypt'
+    block_size = 8
+    parallelism = 1
+
+    @property
+    def work_factor(self) -> int:
+        """Get the CPU/memory cost N, a power of two."""
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        """Hash ``password`` with ``salt``."""
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=256 * n * r * p,
+                               dklen=64)
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return f'{self.algorithm}${n}${salt}${r}${p}${hash_}'
+
+    def decode(self, encoded):
+        """Split an encoded hash into its parts."""
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = encoded.split('$', 5)
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        """Check ``password`` against an encoded hash."""
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(password, decoded['salt'], decoded['work_factor'], decoded['block_size'],
+                                decoded['parallelism'])
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        """Describe an encoded hash for the admin, masking the secrets."""
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): mask_hash(decoded['salt']),
+            _('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        """Rehash passwords encoded with other parameters."""
+        decoded = self.decode(encoded)
+        return (decoded['work_factor'], decoded['block_size'], decoded['parallelism']) != \
+            (self.work_factor, self.block_size, self.parallelism)
+
+    def harden_runtime(self, password, encoded):
+        """Nothing to do, the work factor is in the hash."""
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 hasher with ``PASSWORD_ARGON2_TIME_COST``, ``_MEMORY_COST`` (KiB) and ``_PARALLELISM``.
+
+    Needs the ``argon2-cffi`` package.
+    """
+
+    @property
+    def time_cost(self) -> int:
+        """Get the number of passes."""
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', 2)
+
+    @property
+    def memory_cost(self) -> int:
+        """Get the memory used per hash in KiB."""
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', 102400)
+
+    @property
+    def parallelism(self) -> int:
+        """Get the number of lanes."""
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', 8)
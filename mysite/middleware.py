@@ -0,0 +1,151 @@
+"""Module contains middleware that measures, routes and authenticates each request."""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+from .db import STICKY_COOKIE, replica_enabled, route_reads, wrote
+from .usercache import get_user as get_cached_user
+
+logger = logging.getLogger("mysite.metrics")
+
+FIELDS = ('wall_ms', 'db_queries', 'db_ms', 'render_ms')
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Get the nearest-rank percentile of sorted ``samples``."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))]
+
+
+class MetricsRegistry:
+    """Rolling window of the latest request measurements of each view, kept in process memory."""
+
+    def __init__(self, window: int):
+        """Initialize registry that keeps ``window`` samples per view."""
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+
+    def record(self, view: str, sample: dict):
+        """Add measurements of one request."""
+        with self._lock:
+            self._samples[view].append(sample)
+            self._counts[view] += 1
+
+    def summary(self) -> dict:
+        """Get count and p50/p95/p99 of every field for every view."""
+        with self._lock:
+            samples = {view: list(values) for view, values in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for view, values in sorted(samples.items()):
+            result[view] = {'requests': counts[view], 'window': len(values)}
+            for field in FIELDS:
+                ordered = sorted(sample[field] for sample in values)
+                result[view][field] = {name: percentile(ordered, fraction)
+                                       for name, fraction in (('p50', .50), ('p95', .95), ('p99', .99))}
+        return result
+
+    def reset(self):
+        """Forget every measurement."""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+registry = MetricsRegistry(getattr(settings, 'METRICS_WINDOW', 1000))
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, DB queries, DB time and template render time per URL name.
+
+    Each request is logged as a JSON record on the ``mysite.metrics`` logger and
+    added to ``registry``, which the staff-only metrics page reports. Requests
+    that match no URL pattern (static files, 404s) are not recorded.
+    """
+
+    def __init__(self, get_response):
+        """Initialize middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Measure the request while passing it down the middleware chain."""
+        stats = {'db_queries': 0, 'db_ms': 0.0, 'render_ms': 0.0}
+        request._metrics = stats
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['db_queries'] += 1
+                stats['db_ms'] += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            sample = {'wall_ms': round(wall_ms, 3), 'db_queries': stats['db_queries'],
+                      'db_ms': round(stats['db_ms'], 3), 'render_ms': round(stats['render_ms'], 3)}
+            registry.record(match.view_name, sample)
+            record = dict(sample, view=match.view_name, method=request.method, status=response.status_code)
+            logger.info(json.dumps(record), extra={'metrics': record})
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of template responses."""
+        stats = request._metrics
+        start = time.perf_counter()
+
+        def rendered(response):
+            stats['render_ms'] += (time.perf_counter() - start) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Read from the replica in GET and HEAD requests, and from the primary after a recent write.
+
+    See ``mysite.db`` for the routing rules.
+    """
+
+    def __init__(self, get_response):
+        """Initialize middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Route the reads of the request and make the client sticky to the primary after a write."""
+        if not replica_enabled():
+            return self.get_response(request)
+        use_primary = request.method not in ('GET', 'HEAD') or STICKY_COOKIE in request.COOKIES
+        with route_reads(use_primary):
+            response = self.get_response(request)
+            if wrote():
+                response.set_cookie(STICKY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                                    httponly=True, samesite='Lax')
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """Authentication middleware that reads ``request.user`` from the per-process user cache.
+
+    See ``mysite.usercache``.
+    """
+
+    def process_request(self, request):
+        """Set a lazy ``request.user``, loaded from the cache before the database."""
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,131 @@
+"""Module contains the login rate limiter.
+
+Failed logins are counted in the cache, per client IP address and per username,
+over a sliding window of ``LOGIN_RATE_LIMIT_WINDOW`` seconds. The window is
+approximated with two fixed buckets: the current one, plus the previous one
+weighted by how much of it still overlaps the window. Nothing is written to the
+database.
+
+``LoginRateLimitBackend`` goes first in ``AUTHENTICATION_BACKENDS``. Once a client
+or username is over its limit it refuses the attempt, which stops ``authenticate()``
+before any later backend hashes the password.
+"""
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import PermissionDenied
+from django.http import HttpRequest
+from .audit import audit
+
+ATTEMPTS_KEY = 'login:failures:{}:{}:{}'
+
+logger = logging.getLogger("mysite")
+
+# Used when LOGIN_RATE_LIMIT_CACHE is not configured, or while the shared cache fails,
+# so attempts are still limited per process.
+_local_cache = LocMemCache('login-rate-limit-fallback', {'MAX_ENTRIES': 10000})
+
+
+def get_ip_address(request: HttpRequest):
+    """Get the visitor's IP address using request headers.
+
+    Each of the ``TRUSTED_PROXY_DEPTH`` proxies in front of the site appends the
+    address it received the request from to ``X-Forwarded-For``, so the client is
+    that many entries from the right. Entries further left are set by the client
+    and cannot be trusted. With no trusted proxy, the connection's address is used.
+    """
+    depth = getattr(settings, 'TRUSTED_PROXY_DEPTH', 0)
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if depth and x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(",")]
+        return addresses[-min(depth, len(addresses))]
+    return request.META.get("REMOTE_ADDR")
+
+
+def _cache_call(method: str, *args):
+    """Call ``method`` on the rate limit cache, falling back to the local cache if it fails."""
+    alias = getattr(settings, 'LOGIN_RATE_LIMIT_CACHE', 'default')
+    if alias in settings.CACHES:
+        try:
+            return getattr(caches[alias], method)(*args)
+        except ValueError:
+            # incr() of a missing key
+            raise
+        except Exception:
+            logger.warning(f"Login rate limit cache {alias!r} failed, counting attempts in this process.",
+                           exc_info=True)
+    return getattr(_local_cache, method)(*args)
+
+
+def _identities(request, username) -> list:
+    """Get the ``(scope, key, limit)`` of each identity an attempt counts against."""
+    identities = []
+    ip = get_ip_address(request) if request is not None else None
+    if ip and settings.LOGIN_RATE_LIMIT_IP:
+        identities.append(('ip', ip, settings.LOGIN_RATE_LIMIT_IP))
+    if username and settings.LOGIN_RATE_LIMIT_USERNAME:
+        identities.append(('username', username.lower(), settings.LOGIN_RATE_LIMIT_USERNAME))
+    # hashed, so any username is a valid cache key
+    return [(scope, hashlib.sha256(value.encode()).hexdigest()[:32], limit) for scope, value, limit in identities]
+
+
+def _buckets(scope: str, key: str, now: float):
+    """Get the cache keys of the current and previous bucket, and how much of the previous one still counts."""
+    window = settings.LOGIN_RATE_LIMIT_WINDOW
+    bucket, offset = divmod(now, window)
+    return (ATTEMPTS_KEY.format(scope, key, int(bucket)), ATTEMPTS_KEY.format(scope, key, int(bucket) - 1),
+            1 - offset / window)
+
+
+def failed_attempts(scope: str, key: str, now: float = None) -> float:
+    """Estimate the failed attempts of one identity within the last window."""
+    current, previous, weight = _buckets(scope, key, time.time() if now is None else now)
+    counts = _cache_call('get_many', [current, previous])
+    return counts.get(current, 0) + counts.get(previous, 0) * weight
+
+
+def is_limited(request, username) -> bool:
+    """Tell whether the client or the username of a login attempt is over its limit."""
+    return any(failed_attempts(scope, key) >= limit for scope, key, limit in _identities(request, username))
+
+
+def record_failure(request, username):
+    """Count a failed login against the client and the username."""
+    for scope, key, _ in _identities(request, username):
+        current, _, _ = _buckets(scope, key, time.time())
+        # kept for two windows, as the next bucket still weighs this one
+        _cache_call('add', current, 0, 2 * settings.LOGIN_RATE_LIMIT_WINDOW)
+        try:
+            _cache_call('incr', current)
+        except ValueError:
+            # evicted between add() and incr()
+            _cache_call('set', current, 1, 2 * settings.LOGIN_RATE_LIMIT_WINDOW)
+
+
+def reset_username(username):
+    """Forget the failed logins of a username, e.g. after its owner logged in."""
+    for scope, key, _ in _identities(None, username):
+        current, previous, _ = _buckets(scope, key, time.time())
+        _cache_call('delete_many', [current, previous])
+
+
+class LoginRateLimitBackend:
+    """Authentication backend that refuses logins over the rate limit and never checks passwords itself."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """Refuse the attempt before the password is hashed if it is over the limit."""
+        if is_limited(request, username):
+            if request is not None:
+                request.login_rate_limited = True
+            audit('login_refused', logging.WARNING, username=username,
+                  ip=get_ip_address(request) if request is not None else None)
+            raise PermissionDenied
+        return None
+
+    def get_user(self, user_id):
+        """Load the user of a session logged in with this backend, e.g. by ``Client.force_login()``."""
+        return ModelBackend().get_user(user_id)
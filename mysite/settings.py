@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 import environ
 import django_heroku
@@ -38,6 +39,9 @@ SECRET_KEY = env('SECRET_KEY', default='missing-secret-key')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env("DEBUG", cast=bool, default=False)
 
+# True while running `manage.py test`.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = env('ALLOWED_HOSTS', cast=list, default=["127.0.0.1", "localhost"])
 
 
@@ -54,12 +58,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mysite.middleware.RequestMetricsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'mysite.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mysite.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,21 +90,134 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
+# Number of latest requests per view kept for the percentiles on /metrics/ (RequestMetricsMiddleware).
+METRICS_WINDOW = env('METRICS_WINDOW', cast=int, default=1000)
+
+# Serve the polls pages with async views; turn on when running mysite.asgi:application.
+POLLS_ASYNC_VIEWS = env('POLLS_ASYNC_VIEWS', cast=bool, default=False)
+
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Seconds a database connection stays open between requests (0 closes it after each request).
+DATABASE_CONN_MAX_AGE = env('DATABASE_CONN_MAX_AGE', cast=int, default=600 if IS_HEROKU else 0)
+# Check that persistent connections still work before a request, once they had no query
+# for DATABASE_HEALTH_CHECK_IDLE seconds.
+DATABASE_HEALTH_CHECKS = env('DATABASE_HEALTH_CHECKS', cast=bool, default=True)
+DATABASE_HEALTH_CHECK_IDLE = env('DATABASE_HEALTH_CHECK_IDLE', cast=int, default=30)
+
 if IS_HEROKU:
     DATABASES = {
-        'default': dj_database_url.config(conn_max_age=600, ssl_require=True)
+        'default': dj_database_url.config(conn_max_age=DATABASE_CONN_MAX_AGE, ssl_require=True)
     }
+    if 'DATABASE_REPLICA_URL' in os.environ:
+        DATABASES['replica'] = dj_database_url.config('DATABASE_REPLICA_URL', conn_max_age=DATABASE_CONN_MAX_AGE,
+                                                      ssl_require=True)
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            # A file (not in-memory) test database lets concurrency tests use real SQLite locking.
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        },
+        # Stand-in replica: the primary file itself unless DATABASE_REPLICA_NAME points at a copy.
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('DATABASE_REPLICA_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+        },
     }
 
+# SQLite production profile (see mysite/db.py): WAL journal, synchronous=NORMAL, a busy
+# timeout in milliseconds, memory-mapped I/O in bytes and a page cache in KiB per connection.
+SQLITE_PRODUCTION = env('SQLITE_PRODUCTION', cast=bool, default=False)
+SQLITE_BUSY_TIMEOUT = env('SQLITE_BUSY_TIMEOUT', cast=int, default=5000)
+SQLITE_MMAP_SIZE = env('SQLITE_MMAP_SIZE', cast=int, default=256 * 1024 * 1024)
+SQLITE_CACHE_SIZE = env('SQLITE_CACHE_SIZE', cast=int, default=64 * 1024)
+
+# Read-replica routing (see mysite/db.py): reads of GET and HEAD requests go to the
+# 'replica' database, and a client that just wrote keeps reading the primary for a while.
+DATABASE_ROUTERS = ['mysite.db.PrimaryReplicaRouter']
+DATABASE_READ_REPLICA = env('DATABASE_READ_REPLICA', cast=bool, default=False)
+DATABASE_REPLICA_STICKY_SECONDS = env('DATABASE_REPLICA_STICKY_SECONDS', cast=int, default=10)
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Votes and edits clear cached results and pages in this cache, so every worker must share
+# it: the default is a file cache under BASE_DIR (shared by the workers of one machine or
+# dyno), and a per-process memory cache only while running tests. Use e.g.
+# CACHE_URL=rediscache://... when several machines serve the site.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://' if TESTING else
+                         f"filecache://{os.path.join(BASE_DIR, 'cache')}?max_entries=10000"),
+    # Login rate limit counters, apart from the default cache so page and results entries
+    # never cull them. Point it at a cache shared by all workers, with its own location,
+    # e.g. LOGIN_RATE_LIMIT_CACHE_URL=filecache:///var/tmp/ku-polls-logins?max_entries=10000.
+    'login_rate_limit': env.cache('LOGIN_RATE_LIMIT_CACHE_URL',
+                                  default='locmemcache://login-rate-limit?max_entries=10000'),
+}
+
+# Results cache: how long a tally stays fresh, and how long a stale tally may
+# still be served while one request recomputes it (0 disables stale serving).
+POLLS_RESULTS_CACHE_ALIAS = env('POLLS_RESULTS_CACHE_ALIAS', default='default')
+POLLS_RESULTS_CACHE_TIMEOUT = env('POLLS_RESULTS_CACHE_TIMEOUT', cast=int, default=60)
+POLLS_RESULTS_STALE_TIMEOUT = env('POLLS_RESULTS_STALE_TIMEOUT', cast=int, default=30)
+
+# Poll index: questions per page, and the longest time the rendered list is cached
+# (it always expires earlier when a question is published or ends).
+POLLS_INDEX_PAGE_SIZE = env('POLLS_INDEX_PAGE_SIZE', cast=int, default=20)
+POLLS_INDEX_CACHE_TIMEOUT = env('POLLS_INDEX_CACHE_TIMEOUT', cast=int, default=300)
+
+# Anonymous visitors get the index and results pages from the cache for up to this many
+# seconds; votes and changes to questions or choices replace them at once (0 disables).
+# Off by default with a per-process memory cache, where other workers would keep their page.
+RESULTS_CACHE_IS_LOCAL = CACHES[POLLS_RESULTS_CACHE_ALIAS]['BACKEND'].endswith('.LocMemCache')
+POLLS_PAGE_CACHE_TIMEOUT = env('POLLS_PAGE_CACHE_TIMEOUT', cast=int, default=0 if RESULTS_CACHE_IS_LOCAL else 60)
+
+# Admin lists of tables with more rows than this show an estimated total instead of counting every row.
+POLLS_ADMIN_EXACT_COUNT_LIMIT = env('POLLS_ADMIN_EXACT_COUNT_LIMIT', cast=int, default=10000)
+
+# Vote ingestion: 'sync' records each vote in the request, 'memory' or 'file' queues
+# votes and records them in batches (see polls/ingest.py and `manage.py flush_votes`).
+# A flush interval of 0 disables the in-process flush thread ('file' mode only). The memory
+# buffer is also flushed when the process exits normally.
+POLLS_VOTE_INGESTION = env('POLLS_VOTE_INGESTION', default='sync')
+POLLS_VOTE_SPOOL = env('POLLS_VOTE_SPOOL', default=os.path.join(BASE_DIR, 'vote-spool.jsonl'))
+POLLS_VOTE_FLUSH_INTERVAL = env('POLLS_VOTE_FLUSH_INTERVAL', cast=float, default=1.0)
+POLLS_VOTE_BATCH_SIZE = env('POLLS_VOTE_BATCH_SIZE', cast=int, default=500)
+
+# Times a vote is retried when the database reports a lock error ("database is locked", deadlock).
+POLLS_VOTE_LOCK_RETRIES = env('POLLS_VOTE_LOCK_RETRIES', cast=int, default=5)
+
+# Live results (Server-Sent Events), off by default. Each stream holds a worker thread for
+# up to POLLS_STREAM_MAX_SECONDS, so only turn them on with threaded WSGI workers (e.g.
+# gunicorn --threads 8 --timeout 0); streams are refused under ASGI. Use
+# polls.pubsub.CacheBroker with a shared cache when several worker processes serve streams.
+POLLS_LIVE_RESULTS = env('POLLS_LIVE_RESULTS', cast=bool, default=False)
+POLLS_PUBSUB_BROKER = env('POLLS_PUBSUB_BROKER', default='polls.pubsub.InProcessBroker')
+POLLS_STREAM_HEARTBEAT = env('POLLS_STREAM_HEARTBEAT', cast=int, default=15)
+POLLS_STREAM_MAX_SECONDS = env('POLLS_STREAM_MAX_SECONDS', cast=int, default=300)
+
+
+# Sessions: 'cached_db' reads sessions from the cache and writes them through to the
+# database, 'cache' keeps them in the cache only, 'signed_cookies' keeps them in the
+# browser, 'db' reads the database on every request. The cache must be shared by all
+# workers (CACHE_URL), or a logout in one worker is not seen by the others, so the
+# default is 'cached_db' only when CACHE_URL is set.
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/#configuring-the-session-engine
+SESSION_STORE = env('SESSION_STORE', default='cached_db' if 'CACHE_URL' in os.environ else 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_STORE}'
+SESSION_CACHE_ALIAS = env('SESSION_CACHE_ALIAS', default='default')
+
+# Seconds a logged-in user stays in each worker's memory instead of being read from the
+# database on every request (0 disables), and the most users kept (see mysite/usercache.py).
+AUTH_USER_CACHE_TIMEOUT = env('AUTH_USER_CACHE_TIMEOUT', cast=int, default=60)
+AUTH_USER_CACHE_SIZE = env('AUTH_USER_CACHE_SIZE', cast=int, default=1000)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -118,12 +237,55 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (see mysite/hashers.py): the hasher for new passwords is 'scrypt',
+# 'argon2' (needs argon2-cffi), 'pbkdf2' (Django's default) or 'md5' (fast but insecure,
+# the default while running tests). Hashes made by the other hashers still verify.
+PASSWORD_HASHER = env('PASSWORD_HASHER', default='md5' if TESTING else 'scrypt')
+PASSWORD_SCRYPT_WORK_FACTOR = env('PASSWORD_SCRYPT_WORK_FACTOR', cast=int, default=2 ** 14)
+PASSWORD_ARGON2_TIME_COST = env('PASSWORD_ARGON2_TIME_COST', cast=int, default=2)
+PASSWORD_ARGON2_MEMORY_COST = env('PASSWORD_ARGON2_MEMORY_COST', cast=int, default=102400)
+PASSWORD_ARGON2_PARALLELISM = env('PASSWORD_ARGON2_PARALLELISM', cast=int, default=8)
+PASSWORD_HASHER_CHOICES = {
+    'scrypt': 'mysite.hashers.ScryptPasswordHasher',
+    'argon2': 'mysite.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name not in (PASSWORD_HASHER, 'md5')
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
 # Authentication strategies
 AUTHENTICATION_BACKENDS = [
+    # refuses logins over the rate limit before the password is hashed (see mysite/ratelimit.py)
+    'mysite.ratelimit.LoginRateLimitBackend',
     # username/password authentication
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Login rate limit: failed logins allowed per client IP address and per username within
+# a sliding window of LOGIN_RATE_LIMIT_WINDOW seconds (0 disables a limit). Attempts are
+# counted in the LOGIN_RATE_LIMIT_CACHE cache alias, or in each process if it is not configured.
+LOGIN_RATE_LIMIT_IP = env('LOGIN_RATE_LIMIT_IP', cast=int, default=20)
+LOGIN_RATE_LIMIT_USERNAME = env('LOGIN_RATE_LIMIT_USERNAME', cast=int, default=5)
+LOGIN_RATE_LIMIT_WINDOW = env('LOGIN_RATE_LIMIT_WINDOW', cast=int, default=300)
+LOGIN_RATE_LIMIT_CACHE = env('LOGIN_RATE_LIMIT_CACHE', default='login_rate_limit')
+
+# Number of proxies in front of the site that append to X-Forwarded-For (Heroku's router is one).
+# The client's IP address is read that many entries from the right; with 0 the header is ignored.
+TRUSTED_PROXY_DEPTH = env('TRUSTED_PROXY_DEPTH', cast=int, default=1 if IS_HEROKU else 0)
+
+# Audit log of votes and logins (see mysite/audit.py): JSON lines written by a background
+# thread to AUDIT_LOG_FILE, or to stderr when no file is set. A file name with {pid}, e.g.
+# /var/log/ku-polls/audit-{pid}.log, gives each worker its own file, rotated at
+# AUDIT_LOG_MAX_BYTES with AUDIT_LOG_BACKUP_COUNT old files kept; a file shared by all
+# workers is never rotated by them, rotate it with logrotate. AUDIT_VOTE_SAMPLE_RATE keeps
+# that fraction of vote events (1 keeps all).
+AUDIT_LOG_FILE = env('AUDIT_LOG_FILE', default='')
+AUDIT_LOG_MAX_BYTES = env('AUDIT_LOG_MAX_BYTES', cast=int, default=10 * 1024 * 1024)
+AUDIT_LOG_BACKUP_COUNT = env('AUDIT_LOG_BACKUP_COUNT', cast=int, default=5)
+AUDIT_VOTE_SAMPLE_RATE = env('AUDIT_VOTE_SAMPLE_RATE', cast=float, default=1.0)
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -133,12 +295,34 @@ LOGGING = {
             'format': '[({levelname}) {asctime}]: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'mysite.audit.JSONFormatter',
+        },
+    },
+    'filters': {
+        'audit_sampling': {
+            '()': 'mysite.audit.SamplingFilter',
+            'rates': {'vote': AUDIT_VOTE_SAMPLE_RATE},
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose'
         },
+        # request metrics are written to stderr by a listener thread, not by the request thread
+        'metrics': {
+            'class': 'mysite.audit.AsyncRotatingFileHandler',
+            'formatter': 'verbose',
+        },
+        'audit': {
+            'class': 'mysite.audit.AsyncRotatingFileHandler',
+            'filename': AUDIT_LOG_FILE,
+            'maxBytes': AUDIT_LOG_MAX_BYTES,
+            'backupCount': AUDIT_LOG_BACKUP_COUNT,
+            'formatter': 'json',
+            'filters': ['audit_sampling'],
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -148,7 +332,17 @@ LOGGING = {
         'django': {
             'handlers': ['console'],
             'propagate': False,
-        }
+        },
+        'mysite.metrics': {
+            'handlers': ['metrics'],
+            'level': os.getenv('DJANGO_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'mysite.audit': {
+            'handlers': ['audit'],
+            'level': os.getenv('DJANGO_AUDIT_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
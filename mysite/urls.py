@@ -14,12 +14,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
 from django.urls import path, include
 from . import views
+from .forms import RateLimitedAuthenticationForm
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('accounts/login/', auth_views.LoginView.as_view(authentication_form=RateLimitedAuthenticationForm),
+         name="login"),
     path('accounts/', include('django.contrib.auth.urls')),
     path('signup/', views.signup, name="signup"),
+    path('metrics/', views.metrics, name="metrics"),
     path('', include('polls.urls', namespace="polls"))
 ]
@@ -0,0 +1,103 @@
+"""Module contains the per-process cache of logged-in users.
+
+``CachedAuthenticationMiddleware`` loads ``request.user`` from this cache, so an
+authenticated request does not read ``auth_user``. A cached user is only returned
+while the session's auth hash still matches it, exactly as Django checks a user
+read from the database. Saving or deleting a user drops it from the cache of the
+process that made the change; other processes keep their copy for at most
+``AUTH_USER_CACHE_TIMEOUT`` seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model, user_logged_in
+from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+
+
+class UserCache:
+    """Least recently used users of this process, each kept for ``AUTH_USER_CACHE_TIMEOUT`` seconds."""
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    @property
+    def timeout(self) -> int:
+        """Get the seconds a user is kept, 0 when the cache is disabled."""
+        return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+
+    def get(self, pk):
+        """Get a copy of the cached user with primary key ``pk``, or None."""
+        with self._lock:
+            entry = self._users.get(pk)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._users[pk]
+                return None
+            self._users.move_to_end(pk)
+        # every request gets its own copy, as views may set attributes on request.user
+        return copy.copy(user)
+
+    def set(self, user):
+        """Cache a copy of ``user``."""
+        if not self.timeout:
+            return
+        with self._lock:
+            self._users[user.pk] = (copy.copy(user), time.monotonic() + self.timeout)
+            self._users.move_to_end(user.pk)
+            while len(self._users) > getattr(settings, 'AUTH_USER_CACHE_SIZE', 1000):
+                self._users.popitem(last=False)
+
+    def delete(self, pk):
+        """Drop the user with primary key ``pk``."""
+        with self._lock:
+            self._users.pop(pk, None)
+
+    def clear(self):
+        """Drop every user."""
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+def get_user(request):
+    """Get the user of the request's session, from the cache when its session hash matches."""
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[auth.SESSION_KEY])
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    user = user_cache.get(user_id)
+    if user is not None and backend_path in settings.AUTHENTICATION_BACKENDS:
+        session_hash = request.session.get(auth.HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            return user
+    # not cached, or the session does not match it: let Django check (and flush) the session
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        user_cache.set(user)
+    return user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    """Drop a saved or deleted user from the cache."""
+    user_cache.delete(instance.pk)
+
+
+@receiver(user_logged_in)
+def remember_user(sender, request, user, **kwargs):
+    """Cache a user who just logged in, for their next request."""
+    user_cache.set(user)
@@ -1,10 +1,16 @@
 """Module contains functions for link url to the page."""
-from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate, user_logged_in, user_logged_out, user_login_failed
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.contrib.auth import login, user_logged_in, user_logged_out, user_login_failed
 from django.contrib.auth.forms import UserCreationForm
-from django.http import HttpRequest
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.dispatch import receiver
+from django.views.decorators.http import require_http_methods
 import logging
+from .audit import audit
+from .middleware import registry
+from .ratelimit import get_ip_address, record_failure, reset_username
 
 
 def signup(request):
@@ -14,53 +20,46 @@ def signup(request):
     elif request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
-            username = form.cleaned_data.get('username')
-            raw_passwd = form.cleaned_data.get('password1')
-            user = authenticate(username=username, password=raw_passwd)
-            login(request, user)
+            user = form.save()
+            # The password was just hashed by save(), authenticate() would hash it again.
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             return redirect('polls:index')
         # what if form is not valid?
         # we should display a message in signup.html
         else:
-            return render(request, 'registration/signup.html', {'form': form})
+            return TemplateResponse(request, 'registration/signup.html', {'form': form})
     else:
         form = UserCreationForm()
-    return render(request, 'registration/signup.html', {'form': form})
+    return TemplateResponse(request, 'registration/signup.html', {'form': form})
 
 
-logger = logging.getLogger("mysite")
-
-
-def get_ip_address(request: HttpRequest):
-    """Get the visitor's IP address using request headers.
-
-    Returns:
-        If request is forwarded, returns IP address (separated by ,).
-        else, take the whole header as IP address.
-    """
-    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(",")[0]
-    else:
-        ip = request.META.get("REMOTE_ADDR")
-    return ip
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def metrics(request):
+    """Show latency and query percentiles of each view served by this process, and reset them on POST."""
+    summary = registry.summary()
+    if request.method == 'POST':
+        registry.reset()
+    return JsonResponse({'views': summary})
 
 
 @receiver(user_logged_in)
 def logged_in(request, user, **kwargs):
-    """Log for logged in."""
-    logger.info(f"{user} logged in with IP address: {get_ip_address(request)}")
+    """Log for logged in, and forget the failed logins of the user."""
+    reset_username(user.get_username())
+    audit('login', user=user.pk, ip=get_ip_address(request))
 
 
 @receiver(user_login_failed)
 def login_failed(credentials, request, **kwargs):
-    """Log for unsuccessful login."""
-    logger.warning(f"An attempt to access {credentials.get('username')}"
-                   f" failed with IP address: {get_ip_address(request)}")
+    """Log for unsuccessful login and count it for the rate limit, unless the rate limit refused it."""
+    if not getattr(request, 'login_rate_limited', False):
+        record_failure(request, credentials.get('username'))
+    audit('login_failed', logging.WARNING, username=credentials.get('username'),
+          ip=get_ip_address(request) if request is not None else None)
 
 
 @receiver(user_logged_out)
 def logged_out(request, user, **kwargs):
     """Log for logged out."""
-    logger.info(f"{user} with IP address: {get_ip_address(request)} has logged out.")
+    audit('logout', user=user.pk if user is not None else None, ip=get_ip_address(request))
@@ -1,8 +1,41 @@
 """Module contains config for implementing question in admin site."""
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
 # Register your models here.
-from .models import Question, Choice, Vote
+from .models import Question, Choice, CounterShard, Vote
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of big unfiltered tables instead of counting every row.
+
+    PostgreSQL reads the planner's row estimate, other databases the highest
+    primary key. Filtered lists and tables below ``POLLS_ADMIN_EXACT_COUNT_LIMIT``
+    rows are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        """Return the estimated or exact number of rows."""
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            estimate = int(row[0]) if row else 0
+        else:
+            estimate = queryset.model._default_manager.using(queryset.db).aggregate(last=Max('pk'))['last'] or 0
+        if estimate < getattr(settings, 'POLLS_ADMIN_EXACT_COUNT_LIMIT', 10000):
+            return super().count
+        return estimate
 
 
 class ChoiceInline(admin.StackedInline):
@@ -21,11 +54,80 @@ class QuestionAdmin(admin.ModelAdmin):
     fieldsets = [
         (None, {'fields': ['question_text']}),
         ('Date information', {'fields': ['pub_date', 'end_date'], 'classes': ['collapse']}),
+        ('Vote counting', {'fields': ['counter_shards'], 'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'is_published', 'can_vote', 'end_date')
+    list_display = ('question_text', 'pub_date', 'is_published', 'can_vote', 'end_date', 'total_votes')
     list_filter = ['pub_date', 'end_date']
     search_fields = ['question_text']
 
+    def get_queryset(self, request):
+        """Compute status and vote total of all listed questions in the database."""
+        counters = Choice.objects.filter(question=OuterRef('pk')).values('question')\
+            .annotate(total=Sum('vote_count')).values('total')
+        shards = CounterShard.objects.filter(choice__question=OuterRef('pk')).values('choice__question')\
+            .annotate(total=Sum('count')).values('total')
+        return super().get_queryset(request).with_status()\
+            .annotate(total=Coalesce(Subquery(counters), 0) + Coalesce(Subquery(shards), 0))
+
+    @admin.display(description='Votes', ordering='total')
+    def total_votes(self, question):
+        """Show the vote total annotated by ``get_queryset``."""
+        return question.total
+
+
+class ChoiceAdmin(admin.ModelAdmin):
+    """Choice list with vote counters, loading questions in the same query."""
+
+    list_display = ('choice_text', 'question', 'total_votes')
+    list_select_related = ('question',)
+    raw_id_fields = ('question',)
+    readonly_fields = ('vote_count',)
+    search_fields = ['choice_text', 'question__question_text']
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Add the counter shards of each listed choice to its counter."""
+        return super().get_queryset(request).with_votes()
+
+    def get_readonly_fields(self, request, obj=None):
+        """Keep an existing choice in its question, where its votes are."""
+        if obj is not None:
+            return self.readonly_fields + ('question',)
+        return self.readonly_fields
+
+    @admin.display(description='Votes', ordering='vote_total')
+    def total_votes(self, choice):
+        """Show the vote total annotated by ``get_queryset``."""
+        return choice.vote_total
+
+
+class VoteAdmin(admin.ModelAdmin):
+    """Read-only vote list that joins users, choices and questions and does not count the whole table.
+
+    Votes are only changed by voting, which keeps the counters, cached results
+    and pages in step; an edit here would bypass all of them.
+    """
+
+    list_display = ('__str__', 'user', 'choice', 'question')
+    list_select_related = ('user', 'choice', 'question')
+    search_fields = ['user__username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        """Refuse to add votes."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Refuse to change votes, they can still be viewed."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Refuse to delete votes."""
+        return False
+
 
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(Choice, ChoiceAdmin)
+admin.site.register(Vote, VoteAdmin)
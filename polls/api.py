@@ -0,0 +1,75 @@
+"""Module contains the read-only JSON API of the polls app.
+
+Every response carries an ETag built from cache-held version numbers: the
+question's results version (bumped by votes and by edits of the question or its
+choices) and the next moment any poll opens or closes. A client that sends the
+ETag back in ``If-None-Match`` gets ``304 Not Modified`` from the version lookup
+alone, before any query or tally runs.
+"""
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+from .cache import get_index_boundary, get_index_generation, get_last_modified, get_results, get_version
+from .models import Question
+
+
+def _list_etag(request):
+    """Build ETag of the open polls list."""
+    return f'"polls-{get_index_generation()}-{get_index_boundary(timezone.now()):.0f}"'
+
+
+def _question_etag(request, pk):
+    """Build ETag of a question, its choices and its results."""
+    return f'"poll-{pk}-{get_version(pk)}-{get_index_boundary(timezone.now()):.0f}"'
+
+
+def _question_modified(request, pk):
+    """Get last change time of a question's votes or choices."""
+    return get_last_modified(pk)
+
+
+def _json(data) -> JsonResponse:
+    """Return ``data`` as JSON that clients must revalidate before reuse."""
+    response = JsonResponse(data)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _question_data(question) -> dict:
+    """Serialize the fields of a question annotated with status."""
+    return {
+        'id': question.pk,
+        'question_text': question.question_text,
+        'pub_date': question.pub_date,
+        'end_date': question.end_date,
+        'can_vote': question.can_vote(),
+    }
+
+
+@require_GET
+@condition(etag_func=_list_etag)
+def poll_list(request):
+    """List polls that can be voted now."""
+    questions = Question.objects.open().order_by('-pub_date', '-pk')
+    return _json({'polls': [_question_data(question) for question in questions]})
+
+
+@require_GET
+@condition(etag_func=_question_etag, last_modified_func=_question_modified)
+def poll_detail(request, pk):
+    """Show a published question with its choices."""
+    question = get_object_or_404(Question.objects.published(), pk=pk)
+    data = _question_data(question)
+    data['choices'] = [{'id': pk, 'choice_text': text}
+                       for pk, text in question.choice_set.order_by('pk').values_list('pk', 'choice_text')]
+    return _json(data)
+
+
+@require_GET
+@condition(etag_func=_question_etag, last_modified_func=_question_modified)
+def poll_results(request, pk):
+    """Return the vote tally of a published question."""
+    question = get_object_or_404(Question.objects.published(), pk=pk)
+    return _json(get_results(question).as_dict())
@@ -0,0 +1,73 @@
+"""Module contains async variants of the polls views for ASGI deployments.
+
+They are used instead of the views in ``polls.views`` when ``POLLS_ASYNC_VIEWS``
+is on. Database work runs through ``sync_to_async``, so a slow query waits in a
+worker thread instead of blocking the event loop. Templates are returned as
+``TemplateResponse`` objects, which Django renders in a thread as well.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotFound, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from mysite import usercache
+from .models import Question, QuestionStatus
+from .cache import cache_anonymous_page, get_index_generation, get_index_timeout
+from .views import IndexView, ResultsView, get_detail_context, results_page_version, save_vote
+
+
+async def get_user(request):
+    """Load the user of the request in a thread, from the user cache, so ``request.user`` can be used in async code."""
+    request.user = await sync_to_async(usercache.get_user)(request)
+    return request.user
+
+
+@cache_anonymous_page(get_index_generation, get_index_timeout, params=('after',))
+async def index(request):
+    """Index page that shows list of all polls, active polls first."""
+    view = IndexView()
+    view.setup(request)
+    view.now = timezone.now()
+    view.object_list = view.get_queryset()
+    context = await sync_to_async(view.get_context_data)()
+    return view.render_to_response(context)
+
+
+@cache_anonymous_page(results_page_version)
+async def results(request, pk):
+    """Render result page of an individual question."""
+    view = ResultsView()
+    view.setup(request, pk=pk)
+    view.object = await sync_to_async(view.get_object)()
+    context = await sync_to_async(view.get_context_data)(object=view.object)
+    return view.render_to_response(context)
+
+
+async def detail(request, question_id):
+    """Render details page for individual question."""
+    question = await sync_to_async(get_object_or_404)(Question.objects.with_status(), pk=question_id)
+    if question.status != QuestionStatus.OPEN:
+        return HttpResponseNotFound("This poll cannot be voted.")
+    user = await get_user(request)
+    context = await sync_to_async(get_detail_context)(question, user)
+    return TemplateResponse(request, "polls/details.html", context)
+
+
+async def vote(request, question_id):
+    """Vote page that process vote privately and return to result page if success."""
+    user = await get_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), '/accounts/login/')
+    question = await sync_to_async(get_object_or_404)(Question.objects.with_status(), pk=question_id)
+    if not question.can_vote():
+        return HttpResponseNotFound("This poll cannot be voted.")
+    try:
+        selected_choice = await sync_to_async(question.choice_set.get)(pk=request.POST['choice'])
+    except Exception:
+        context = await sync_to_async(get_detail_context)(question, user)
+        context['error_message'] = "Please select a choice"
+        return TemplateResponse(request, "polls/details.html", context)
+    await sync_to_async(save_vote)(user, question, selected_choice)
+    return HttpResponseRedirect(reverse('polls:results', args=[question.id],))
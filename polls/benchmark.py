@@ -0,0 +1,187 @@
+"""Module contains the synthetic data generator and timed scenarios of the benchmark command.
+
+Data is generated with a seeded random generator, so two runs with the same
+sizes and seed produce the same polls and the same votes. Rows are inserted
+with ``bulk_create`` in batches, and choice vote counters are computed before
+the choices are inserted, so the generated polls are consistent without a
+``rebuild_vote_counts`` pass.
+"""
+import datetime
+import itertools
+import random
+import statistics
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .cache import bump_index_generation
+from .models import Choice, Question, Vote
+
+SCENARIOS = ('index', 'detail', 'vote_submit', 'vote_change', 'results')
+
+
+def _bulk_create(model, objs, batch_size: int):
+    """Insert ``objs`` in batches without holding more than one batch in memory."""
+    objs = iter(objs)
+    while True:
+        batch = list(itertools.islice(objs, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, batch_size)
+
+
+def _last_pk(model) -> int:
+    """Get the highest primary key of ``model``, 0 when the table is empty."""
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class SyntheticData:
+    """Polls, users and votes generated for one benchmark run."""
+
+    def __init__(self, questions: int, choices: int, users: int, votes: int, seed: int = 0):
+        """Initialize sizes: ``votes`` is the number of questions each user votes on."""
+        if votes > questions:
+            raise ValueError("Each user can vote at most once per question, so votes must not exceed questions.")
+        self.questions = questions
+        self.choices = choices
+        self.users = users
+        self.votes = votes
+        self.seed = seed
+        self.question_ids = []
+        self.choice_ids = []
+        self.user_ids = []
+
+    def picks(self):
+        """Yield ``(user index, question index, choice index)`` of every generated vote, always in the same order."""
+        rng = random.Random(self.seed)
+        for user in range(self.users):
+            for offset in range(self.votes):
+                yield user, (user * self.votes + offset) % self.questions, rng.randrange(self.choices)
+
+    def question(self, index: int, now) -> Question:
+        """Build question ``index``: every tenth has ended and every tenth is still open with an end date."""
+        pub_date = now - datetime.timedelta(days=1, minutes=index)
+        end_date = None
+        if index % 10 == 0:
+            end_date = now - datetime.timedelta(hours=1)
+        elif index % 10 == 1:
+            end_date = now + datetime.timedelta(days=30)
+        return Question(question_text=f"Benchmark poll {index}", pub_date=pub_date, end_date=end_date)
+
+    def generate(self, batch_size: int = 5000):
+        """Insert questions, choices with their vote counts, users and votes."""
+        now = timezone.now()
+        counts = [0] * (self.questions * self.choices)
+        for _, question, choice in self.picks():
+            counts[question * self.choices + choice] += 1
+
+        last = _last_pk(Question)
+        _bulk_create(Question, (self.question(i, now) for i in range(self.questions)), batch_size)
+        self.question_ids = list(Question.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+
+        last = _last_pk(Choice)
+        _bulk_create(Choice, (Choice(question_id=question_id, choice_text=f"Choice {c}",
+                                     vote_count=counts[q * self.choices + c])
+                              for q, question_id in enumerate(self.question_ids) for c in range(self.choices)),
+                     batch_size)
+        self.choice_ids = list(Choice.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+
+        last = _last_pk(User)
+        password = make_password(None)
+        tag = time.time_ns()
+        _bulk_create(User, (User(username=f"bench-{tag}-{u}", password=password) for u in range(self.users)),
+                     batch_size)
+        self.user_ids = list(User.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+
+        _bulk_create(Vote, (Vote(user_id=self.user_ids[user], question_id=self.question_ids[question],
+                                 choice_id=self.choice_ids[question * self.choices + choice])
+                            for user, question, choice in self.picks()), batch_size)
+        bump_index_generation()
+
+    def open_question_ids(self, limit: int = 100) -> list:
+        """Get up to ``limit`` generated questions that can be voted."""
+        return [question_id for i, question_id in enumerate(self.question_ids) if i % 10 != 0][:limit]
+
+    def choices_of(self, question_id: int) -> list:
+        """Get choice ids of a generated question."""
+        start = self.question_ids.index(question_id) * self.choices
+        return self.choice_ids[start:start + self.choices]
+
+
+def _timed(client, requests) -> dict:
+    """Send ``requests``, a list of ``(setup, method, path, data)``, and summarize latency and queries.
+
+    ``setup`` is called before each request, outside the timing, e.g. to log in.
+    """
+    latencies = []
+    errors = 0
+    total_queries = 0
+    for setup, method, path, data in requests:
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, data)
+            latencies.append((time.perf_counter() - start) * 1000)
+        total_queries += len(queries)
+        if response.status_code >= 400:
+            errors += 1
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_per_request': round(total_queries / len(latencies), 2),
+    }
+
+
+def run_scenarios(data: SyntheticData, repeat: int, scenarios=SCENARIOS) -> dict:
+    """Time each scenario ``repeat`` times through the test client, after one untimed warm-up request."""
+    open_ids = data.open_question_ids()
+    voter = User.objects.get(pk=data.user_ids[0])
+    client = Client()
+    client.force_login(voter)
+
+    def rotate(path_name):
+        return [(None, 'get', reverse(path_name, args=[open_ids[i % len(open_ids)]]), None)
+                for i in range(repeat + 1)]
+
+    def submit():
+        question_id = open_ids[0]
+        choice_id = data.choices_of(question_id)[0]
+        fresh = [User(username=f"bench-new-{time.time_ns()}-{i}", password=voter.password)
+                 for i in range(repeat + 1)]
+        User.objects.bulk_create(fresh)
+        fresh = User.objects.filter(username__in=[user.username for user in fresh])
+        return [(lambda user=user: client.force_login(user), 'post', reverse('polls:vote', args=[question_id]),
+                 {'choice': choice_id}) for user in fresh]
+
+    def change():
+        question_id = open_ids[0]
+        choice_ids = data.choices_of(question_id)
+        client.force_login(voter)
+        return [(None, 'post', reverse('polls:vote', args=[question_id]),
+                 {'choice': choice_ids[i % len(choice_ids)]}) for i in range(repeat + 1)]
+
+    builders = {
+        'index': lambda: [(None, 'get', reverse('polls:index'), None)] * (repeat + 1),
+        'detail': lambda: rotate('polls:detail'),
+        'vote_submit': submit,
+        'vote_change': change,
+        'results': lambda: rotate('polls:results'),
+    }
+    results = {}
+    for name in scenarios:
+        requests = builders[name]()
+        _timed(client, requests[:1])
+        results[name] = _timed(client, requests[1:])
+    return results
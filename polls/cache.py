@@ -0,0 +1,229 @@
+"""Module contains the caches for question results and the poll index.
+
+Each question has a version number in the cache. Recording or changing a vote
+bumps it, which makes every cached tally of that question stale. A stale tally
+may still be served for ``POLLS_RESULTS_STALE_TIMEOUT`` seconds while a single
+request recomputes it, so a popular poll never sends every reader to the database.
+
+The rendered poll index is cached as a template fragment. Its key contains a
+generation number that changes when a question is saved or deleted, and it
+expires at the next ``pub_date``/``end_date`` of any question, which is the only
+other moment the list can change.
+
+Anonymous visitors get whole pages from ``cache_anonymous_page``, keyed by path,
+the query parameters the view reads, and the same version or generation numbers,
+so a hit needs neither templates nor the database.
+"""
+import asyncio
+import datetime
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Min, Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import urlencode
+from .models import Question
+from .tally import get_tally
+
+VERSION_KEY = 'polls:results:version:{}'
+RESULTS_KEY = 'polls:results:{}'
+LOCK_KEY = 'polls:results:lock:{}'
+MODIFIED_KEY = 'polls:results:modified:{}'
+INDEX_GENERATION_KEY = 'polls:index:generation'
+INDEX_BOUNDARY_KEY = 'polls:index:boundary'
+PAGE_KEY = 'polls:page:{}:{}'
+
+
+def get_results_cache():
+    """Get the cache backend configured for results."""
+    return caches[getattr(settings, 'POLLS_RESULTS_CACHE_ALIAS', 'default')]
+
+
+def _new_version() -> int:
+    """Create a version number that cannot collide with one evicted from the cache."""
+    return time.time_ns()
+
+
+def get_version(question_id: int) -> int:
+    """Get the current results version of a question."""
+    cache = get_results_cache()
+    version = cache.get(VERSION_KEY.format(question_id))
+    if version is None:
+        cache.add(VERSION_KEY.format(question_id), _new_version(), None)
+        version = cache.get(VERSION_KEY.format(question_id))
+    return version
+
+
+def bump_version(question_id: int) -> int:
+    """Mark cached results of a question as stale and return the new version."""
+    cache = get_results_cache()
+    cache.set(MODIFIED_KEY.format(question_id), time.time(), None)
+    try:
+        return cache.incr(VERSION_KEY.format(question_id))
+    except ValueError:
+        version = _new_version()
+        cache.set(VERSION_KEY.format(question_id), version, None)
+        return version
+
+
+def get_last_modified(question_id: int):
+    """Get the time of the last change to a question's votes or choices, or None if unknown."""
+    modified = get_results_cache().get(MODIFIED_KEY.format(question_id))
+    return datetime.datetime.fromtimestamp(modified, datetime.timezone.utc) if modified else None
+
+
+def get_results(question):
+    """Get the tally of ``question`` (a Question or its id) from cache, computing it when needed."""
+    question_id = getattr(question, 'pk', question)
+    cache = get_results_cache()
+    timeout = getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 60)
+    stale_timeout = getattr(settings, 'POLLS_RESULTS_STALE_TIMEOUT', 0)
+    version = get_version(question_id)
+    entry = cache.get(RESULTS_KEY.format(question_id))
+    if entry is not None:
+        if entry['version'] == version and entry['fresh_until'] > time.time():
+            return entry['tally']
+        if stale_timeout and not cache.add(LOCK_KEY.format(question_id), True, stale_timeout):
+            # Another request is already recomputing this tally.
+            return entry['tally']
+    tally = get_tally(question_id)
+    entry = {'version': version, 'fresh_until': time.time() + timeout, 'tally': tally}
+    cache.set(RESULTS_KEY.format(question_id), entry, timeout + stale_timeout)
+    cache.delete(LOCK_KEY.format(question_id))
+    return tally
+
+
+def is_results_stale(question_id: int) -> bool:
+    """Tell whether the cached tally of a question is missing or older than its votes."""
+    entry = get_results_cache().get(RESULTS_KEY.format(question_id))
+    return entry is None or entry['version'] != get_version(question_id)
+
+
+def get_index_generation() -> int:
+    """Get the generation number of the cached poll index."""
+    cache = get_results_cache()
+    generation = cache.get(INDEX_GENERATION_KEY)
+    if generation is None:
+        cache.add(INDEX_GENERATION_KEY, _new_version(), None)
+        generation = cache.get(INDEX_GENERATION_KEY)
+    return generation
+
+
+def bump_index_generation():
+    """Discard the cached poll index after questions were changed."""
+    cache = get_results_cache()
+    cache.delete(INDEX_BOUNDARY_KEY)
+    try:
+        cache.incr(INDEX_GENERATION_KEY)
+    except ValueError:
+        cache.set(INDEX_GENERATION_KEY, _new_version(), None)
+
+
+def get_index_boundary(now) -> float:
+    """Get the next publish or end date of any question as a timestamp."""
+    cache = get_results_cache()
+    boundary = cache.get(INDEX_BOUNDARY_KEY)
+    if boundary is None:
+        max_timeout = getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 300)
+        dates = Question.objects.aggregate(
+            next_pub=Min('pub_date', filter=Q(pub_date__gt=now)),
+            next_end=Min('end_date', filter=Q(end_date__gt=now)),
+        )
+        upcoming = [date for date in dates.values() if date is not None]
+        boundary = min(upcoming).timestamp() if upcoming else now.timestamp() + max_timeout
+        cache.set(INDEX_BOUNDARY_KEY, boundary, max(0, int(boundary - now.timestamp())))
+    return boundary
+
+
+def get_index_timeout(now) -> int:
+    """Get the seconds the poll index may be cached, up to the next publish or end date."""
+    max_timeout = getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 300)
+    return max(0, min(int(get_index_boundary(now) - now.timestamp()), max_timeout))
+
+
+def skip_page_cache(request):
+    """Keep the page of this request out of the anonymous page cache, e.g. because it shows stale data."""
+    request.skip_page_cache = True
+
+
+def _page_key(request, get_page_version, view_kwargs, params) -> str:
+    """Get the page cache key of an anonymous GET request, or None if its page must not come from the cache."""
+    if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES \
+            or not getattr(settings, 'POLLS_PAGE_CACHE_TIMEOUT', 0):
+        # a session cookie may belong to a logged in user, who sees their own page
+        return None
+    if any(name not in params or len(request.GET.getlist(name)) > 1 for name in request.GET):
+        # parameters the view ignores would only add copies of the same page to the cache
+        return None
+    query = urlencode(sorted((name, request.GET[name]) for name in params if name in request.GET))
+    path = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return PAGE_KEY.format(get_page_version(**view_kwargs), path)
+
+
+def _cached_page(key):
+    """Get the cached response stored under ``key``, or None."""
+    page = get_results_cache().get(key)
+    if page is None:
+        return None
+    response = HttpResponse(page['content'], content_type=page['content_type'])
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _store_page(key, request, response, get_timeout):
+    """Cache the page of ``response`` once it is rendered, if it is the same for every anonymous visitor."""
+    def store(response):
+        if response.status_code != 200 or response.cookies or request.META.get('CSRF_COOKIE_USED') \
+                or getattr(request, 'skip_page_cache', False):
+            return
+        timeout = settings.POLLS_PAGE_CACHE_TIMEOUT
+        if get_timeout is not None:
+            timeout = min(timeout, get_timeout(timezone.now()))
+        page = {'content': response.content, 'content_type': response['Content-Type']}
+        get_results_cache().set(key, page, timeout)
+
+    patch_vary_headers(response, ('Cookie',))
+    if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    return response
+
+
+def cache_anonymous_page(get_page_version, get_timeout=None, params=()):
+    """Decorate a view so anonymous GET requests are answered from a cache of whole pages.
+
+    Pages are cached under their path, the query ``params`` the view reads, and
+    ``get_page_version(**view_kwargs)``, a number that changes whenever the page
+    would (see ``bump_version`` and ``bump_index_generation``), for at most
+    ``POLLS_PAGE_CACHE_TIMEOUT`` seconds, or ``get_timeout(now)`` seconds if that
+    is less. Requests with a session
+    cookie, or with any other query parameter, always reach the view.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                key = _page_key(request, get_page_version, kwargs, params)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+                cached = _cached_page(key)
+                if cached is not None:
+                    return cached
+                return _store_page(key, request, await view(request, *args, **kwargs), get_timeout)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                key = _page_key(request, get_page_version, kwargs, params)
+                if key is None:
+                    return view(request, *args, **kwargs)
+                cached = _cached_page(key)
+                if cached is not None:
+                    return cached
+                return _store_page(key, request, view(request, *args, **kwargs), get_timeout)
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+"""Module contains system checks of the polls settings."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_vote_ingestion(app_configs, **kwargs):
+    """Check that votes buffered in memory are flushed by the process that buffered them."""
+    if getattr(settings, 'POLLS_VOTE_INGESTION', 'sync') == 'memory' \
+            and not getattr(settings, 'POLLS_VOTE_FLUSH_INTERVAL', 1.0):
+        return [Error(
+            "POLLS_VOTE_INGESTION='memory' needs a POLLS_VOTE_FLUSH_INTERVAL above 0.",
+            hint="Votes in memory can only be flushed by their own process. Set an interval, "
+                 "or use 'file' ingestion with manage.py flush_votes.",
+            id='polls.E001',
+        )]
+    return []
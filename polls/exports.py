@@ -0,0 +1,95 @@
+"""Module contains staff-only CSV downloads of raw votes and per-question results.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written to
+a ``StreamingHttpResponse`` as they arrive, so memory use stays flat however
+many votes there are. Add ``?gzip=1`` to get a ``.csv.gz`` compressed on the
+fly, and ``?question=<id>`` to export a single question. Downloads are only
+served by the WSGI server.
+"""
+import csv
+import zlib
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .models import Choice, Vote
+from .views import served_by_asgi
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object that returns what is written, so ``csv.writer`` can feed a generator."""
+
+    def write(self, value):
+        """Return ``value`` instead of storing it."""
+        return value
+
+
+def csv_rows(header, rows):
+    """Yield CSV lines of ``header`` followed by ``rows``."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def gzip_stream(chunks, batch: int = 64 * 1024):
+    """Compress text ``chunks`` into a gzip stream, yielding about ``batch`` bytes at a time."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = []
+    size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= batch:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+
+def csv_response(request, filename: str, header, rows) -> HttpResponse:
+    """Stream ``rows`` as a CSV attachment, compressed when ``?gzip=1`` is given.
+
+    The ASGI handler would read ``rows`` on the event loop, so downloads are
+    refused there; ``manage.py export_polls`` works whatever the server.
+    """
+    if served_by_asgi(request):
+        return HttpResponse("CSV downloads need the WSGI server, use manage.py export_polls.", status=501)
+    lines = csv_rows(header, rows)
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(gzip_stream(lines), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _for_question(request, queryset):
+    """Narrow ``queryset`` to ``?question=<id>`` when given."""
+    question_id = request.GET.get('question', '')
+    return queryset.filter(question_id=int(question_id)) if question_id.isdigit() else queryset
+
+
+@staff_member_required
+@require_GET
+def votes_csv(request):
+    """Download every vote with its question, choice and user, one row per vote."""
+    votes = _for_question(request, Vote.objects.all()).order_by('pk').values_list(
+        'pk', 'question_id', 'question__question_text', 'choice_id', 'choice__choice_text', 'user_id',
+        'user__username')
+    header = ('vote', 'question', 'question_text', 'choice', 'choice_text', 'user', 'username')
+    return csv_response(request, 'votes.csv', header, votes.iterator(chunk_size=CHUNK_SIZE))
+
+
+@staff_member_required
+@require_GET
+def results_csv(request):
+    """Download vote counts, one row per choice grouped by question."""
+    choices = _for_question(request, Choice.objects.with_votes()).order_by('question_id', 'pk').values_list(
+        'question_id', 'question__question_text', 'pk', 'choice_text', 'vote_total')
+    header = ('question', 'question_text', 'choice', 'choice_text', 'votes')
+    return csv_response(request, 'results.csv', header, choices.iterator(chunk_size=CHUNK_SIZE))
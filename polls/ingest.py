@@ -0,0 +1,239 @@
+"""Module contains the optional write-behind queue for votes.
+
+With ``POLLS_VOTE_INGESTION = 'sync'`` (the default) the vote view records
+every vote in its own transaction. In ``'memory'`` or ``'file'`` mode the view
+only validates the vote and appends it to a buffer. The buffer is flushed in
+batches by a background thread (every ``POLLS_VOTE_FLUSH_INTERVAL`` seconds) or
+by ``manage.py flush_votes``, and the memory buffer once more when the process
+exits. When a user votes several times before a flush, their last vote wins.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.contrib.auth.models import User
+from django.db.models import Case, F, IntegerField, Value, When
+from .cache import bump_version, get_results_cache
+from .models import Choice, Vote
+from .pubsub import publish_results
+from .voting import record_vote
+
+LAST_FLUSH_KEY = 'polls:votes:flushed:{}'
+
+logger = logging.getLogger("polls")
+
+
+class MemoryVoteBuffer:
+    """In-process buffer of pending votes, shared by all threads of a worker."""
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._entries = deque()
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict):
+        """Add a pending vote."""
+        self._entries.append(entry)
+
+    def drain(self, limit: int) -> list:
+        """Remove and return up to ``limit`` pending votes in arrival order."""
+        with self._lock:
+            return [self._entries.popleft() for _ in range(min(limit, len(self._entries)))]
+
+
+class FileVoteBuffer:
+    """Buffer of pending votes in an append-only JSON lines file, shared by all workers (POSIX only)."""
+
+    def __init__(self, path):
+        """Initialize buffer stored at ``path``."""
+        self.path = str(path)
+        self._pending = deque()
+
+    def append(self, entry: dict):
+        """Add a pending vote under an exclusive lock, retrying if the file was claimed meanwhile."""
+        import fcntl
+        line = (json.dumps(entry) + '\n').encode()
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_nlink:
+                    os.write(fd, line)
+                    return
+            finally:
+                os.close(fd)
+
+    def drain(self, limit: int) -> list:
+        """Remove and return up to ``limit`` pending votes in arrival order."""
+        import fcntl
+        if not self._pending:
+            claimed = f"{self.path}.{os.getpid()}.{time.time_ns()}"
+            try:
+                os.rename(self.path, claimed)
+            except FileNotFoundError:
+                return []
+            with open(claimed) as spool:
+                fcntl.flock(spool, fcntl.LOCK_EX)
+                self._pending.extend(json.loads(line) for line in spool if line.strip())
+                os.remove(claimed)
+        return [self._pending.popleft() for _ in range(min(limit, len(self._pending)))]
+
+
+_buffers = {}
+_flusher = None
+_flusher_lock = threading.Lock()
+_exit_flush_registered = False
+
+
+def get_ingestion_mode() -> str:
+    """Get the configured ingestion mode: 'sync', 'memory' or 'file'."""
+    return getattr(settings, 'POLLS_VOTE_INGESTION', 'sync')
+
+
+def get_buffer():
+    """Get the buffer of the configured ingestion mode."""
+    mode = get_ingestion_mode()
+    if mode == 'memory':
+        key = mode
+    elif mode == 'file':
+        key = str(settings.POLLS_VOTE_SPOOL)
+    else:
+        raise ValueError(f"Vote ingestion mode {mode!r} has no buffer.")
+    if key not in _buffers:
+        _buffers[key] = MemoryVoteBuffer() if mode == 'memory' else FileVoteBuffer(key)
+    return _buffers[key]
+
+
+def enqueue_vote(user, choice):
+    """Queue a validated vote of ``user`` for ``choice`` to be recorded by the next flush."""
+    get_buffer().append({'user': user.pk, 'question': choice.question_id, 'choice': choice.pk})
+    _start_flusher()
+    if get_ingestion_mode() == 'memory':
+        _register_exit_flush()
+
+
+def _register_exit_flush():
+    """Flush the memory buffer when the process exits, registered once per process."""
+    global _exit_flush_registered
+    if _exit_flush_registered:
+        return
+    with _flusher_lock:
+        if not _exit_flush_registered:
+            atexit.register(_flush_at_exit)
+            _exit_flush_registered = True
+
+
+def _flush_at_exit():
+    """Record the votes still in the memory buffer when the process exits normally.
+
+    Votes are lost if the process is killed (``SIGKILL``, out of memory) before this runs.
+    """
+    buffer = _buffers.get('memory')
+    if buffer is None:
+        return
+    try:
+        flush(buffer)
+    except Exception:
+        logger.exception("Flushing buffered votes at exit failed.")
+
+
+def _start_flusher():
+    """Start the background flush thread once per process, unless disabled."""
+    global _flusher
+    interval = getattr(settings, 'POLLS_VOTE_FLUSH_INTERVAL', 1.0)
+    if not interval or (_flusher is not None and _flusher.is_alive()):
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_forever, args=(interval,), name='vote-flusher', daemon=True)
+            _flusher.start()
+
+
+def _flush_forever(interval: float):
+    """Flush the buffer every ``interval`` seconds."""
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Flushing buffered votes failed.")
+        finally:
+            connection.close()
+
+
+def flush(buffer=None) -> int:
+    """Record every pending vote of ``buffer`` in batches and return how many were flushed."""
+    buffer = buffer or get_buffer()
+    batch_size = getattr(settings, 'POLLS_VOTE_BATCH_SIZE', 500)
+    flushed = 0
+    while True:
+        entries = buffer.drain(batch_size)
+        if not entries:
+            return flushed
+        flush_votes(entries)
+        flushed += len(entries)
+
+
+def flush_votes(entries: list):
+    """Record a batch of queued votes with bulk writes, keeping the last vote of each user per question."""
+    latest = {}
+    for entry in entries:
+        latest[entry['user'], entry['question']] = entry['choice']
+    try:
+        _apply(latest)
+    except IntegrityError:
+        # A vote was recorded elsewhere between reading and inserting, or a user or choice was deleted
+        # since the vote was queued; record the votes one by one and drop only those that fail.
+        for (user_id, question_id), choice_id in latest.items():
+            try:
+                record_vote(User(pk=user_id), Choice(pk=choice_id, question_id=question_id))
+            except DatabaseError:
+                logger.exception(f"Dropped buffered vote of user {user_id} for choice {choice_id}.")
+    finally:
+        now = time.time()
+        cache = get_results_cache()
+        for question_id in {question_id for _, question_id in latest}:
+            publish_results(question_id, bump_version(question_id))
+            cache.set(LAST_FLUSH_KEY.format(question_id), now, None)
+
+
+def _apply(latest: dict):
+    """Create, move and count the votes in ``latest`` in one transaction."""
+    deltas = {}
+    with transaction.atomic():
+        votes = Vote.objects.select_for_update()\
+            .filter(user_id__in={user_id for user_id, _ in latest},
+                    question_id__in={question_id for _, question_id in latest})\
+            .only('pk', 'user', 'question', 'choice')
+        existing = {(vote.user_id, vote.question_id): vote for vote in votes}
+        created, moved = [], []
+        for (user_id, question_id), choice_id in latest.items():
+            vote = existing.get((user_id, question_id))
+            if vote is None:
+                created.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id))
+            elif vote.choice_id != choice_id:
+                deltas[vote.choice_id] = deltas.get(vote.choice_id, 0) - 1
+                vote.choice_id = choice_id
+                moved.append(vote)
+            else:
+                continue
+            deltas[choice_id] = deltas.get(choice_id, 0) + 1
+        Vote.objects.bulk_create(created)
+        Vote.objects.bulk_update(moved, ['choice'])
+        deltas = {choice_id: delta for choice_id, delta in deltas.items() if delta}
+        if deltas:
+            Choice.objects.filter(pk__in=deltas).update(vote_count=F('vote_count') + Case(
+                *(When(pk=choice_id, then=Value(delta)) for choice_id, delta in deltas.items()),
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+
+
+def get_last_flush(question_id: int):
+    """Get the time (seconds since epoch) buffered votes of a question were last recorded, or None."""
+    return get_results_cache().get(LAST_FLUSH_KEY.format(question_id))
@@ -0,0 +1,76 @@
+"""Management command that generates synthetic polls and times the polls hot paths."""
+import datetime
+import json
+import logging
+import platform
+import time
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from polls.benchmark import SCENARIOS, SyntheticData, run_scenarios
+from polls.ingest import get_ingestion_mode
+
+
+class Command(BaseCommand):
+    """Generate questions, choices, users and votes, then time index, detail, vote and results requests."""
+
+    help = ("Benchmark the polls pages on synthetic data, e.g. "
+            "manage.py benchmark --questions 10000 --users 10000 --votes 100 --output bench.json. "
+            "Data is rolled back afterwards unless --keep is given.")
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--questions', type=int, default=1000, help="Number of questions to generate.")
+        parser.add_argument('--choices', type=int, default=4, help="Choices per question.")
+        parser.add_argument('--users', type=int, default=1000, help="Number of voters to generate.")
+        parser.add_argument('--votes', type=int, default=10, help="Questions each voter votes on.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random vote picks.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT.")
+        parser.add_argument('--repeat', type=int, default=100, help="Timed requests per scenario.")
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+                            help="Scenario to run, can be repeated (default: all).")
+        parser.add_argument('--output', help="Write the results as JSON to this file instead of standard output.")
+        parser.add_argument('--keep', action='store_true', help="Commit the generated data instead of rolling back.")
+
+    def handle(self, *args, **options):
+        """Generate the data, run the scenarios and report them."""
+        try:
+            data = SyntheticData(options['questions'], options['choices'], options['users'], options['votes'],
+                                 options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+        report = {
+            'started': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'parameters': {name: options[name] for name in
+                           ('questions', 'choices', 'users', 'votes', 'seed', 'repeat')},
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'vote_ingestion': get_ingestion_mode(),
+                'async_views': settings.POLLS_ASYNC_VIEWS,
+            },
+        }
+        # per-request log lines would dominate the timings
+        logging.disable(logging.INFO)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+                start = time.perf_counter()
+                data.generate(options['batch_size'])
+                report['generate_seconds'] = round(time.perf_counter() - start, 3)
+                report['scenarios'] = run_scenarios(data, options['repeat'], options['scenarios'] or SCENARIOS)
+                transaction.set_rollback(not options['keep'])
+        finally:
+            logging.disable(logging.NOTSET)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            for name, result in report['scenarios'].items():
+                self.stdout.write(f"{name:>12}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+                                  f"{result['queries_per_request']:g} queries")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,66 @@
+"""Management command that measures signups per second with each password hasher."""
+import logging
+import time
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+PASSWORD = "Bench-mark-2021!"
+
+
+class Command(BaseCommand):
+    """Sign users up through the signup view in one thread, so results are per core. Data is rolled back."""
+
+    help = "Benchmark signups per second and per core: manage.py benchmark_signup --signups 20 --hasher pbkdf2"
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--signups', type=int, default=20, help="Signups per measurement.")
+        parser.add_argument('--hasher', action='append', choices=list(settings.PASSWORD_HASHER_CHOICES),
+                            dest='hashers', help="Hasher to measure, can be repeated (default: pbkdf2 and the "
+                                                 "configured PASSWORD_HASHER).")
+
+    def handle(self, *args, **options):
+        """Measure each hasher with and without the second hash of the old signup flow."""
+        hashers = options['hashers'] or list(dict.fromkeys(['pbkdf2', settings.PASSWORD_HASHER]))
+        self.stdout.write(f"{'hasher':>8} {'signup only/s':>14} {'+ authenticate/s':>17}")
+        # one log line per signup would be part of the timing
+        logging.disable(logging.INFO)
+        try:
+            for name in hashers:
+                with override_settings(PASSWORD_HASHERS=[settings.PASSWORD_HASHER_CHOICES[name]],
+                                       ALLOWED_HOSTS=['testserver']), transaction.atomic():
+                    transaction.set_rollback(True)
+                    try:
+                        make_password(PASSWORD)
+                    except ValueError as error:
+                        # e.g. argon2-cffi is not installed
+                        self.stdout.write(f"{name:>8} skipped: {error}")
+                        continue
+                    new = self.signups_per_second(options['signups'], f"{name}-new", reauthenticate=False)
+                    old = self.signups_per_second(options['signups'], f"{name}-old", reauthenticate=True)
+                self.stdout.write(f"{name:>8} {new:>14.1f} {old:>17.1f}")
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def signups_per_second(self, signups: int, tag: str, reauthenticate: bool) -> float:
+        """Sign up ``signups`` users and return the rate; ``reauthenticate`` adds the old flow's authenticate()."""
+        client = Client()
+        elapsed = 0.0
+        for i in range(signups):
+            username = f"bench-signup-{tag}-{i}"
+            start = time.perf_counter()
+            response = client.post(reverse('signup'), {'username': username, 'password1': PASSWORD,
+                                                       'password2': PASSWORD})
+            if reauthenticate:
+                authenticate(username=username, password=PASSWORD)
+            elapsed += time.perf_counter() - start
+            if response.status_code != 302:
+                raise CommandError(f"Signup failed with status {response.status_code}.")
+            client.logout()
+        return signups / elapsed
@@ -0,0 +1,53 @@
+"""Management command that compares per-choice vote counting with the tally service."""
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from polls.models import Question, Choice, Vote
+from polls.tally import get_tally
+
+
+def per_choice_counts(question):
+    """Count votes the way the results page used to, one COUNT query per choice."""
+    return [Vote.objects.filter(choice=choice).count() for choice in question.choice_set.all()]
+
+
+class Command(BaseCommand):
+    """Time both results pipelines on throwaway polls of several sizes."""
+
+    help = "Benchmark results counting at several poll sizes. Data is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--choices', type=int, nargs='+', default=[5, 50, 500],
+                            help="Poll sizes (number of choices) to benchmark.")
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per measurement.")
+
+    def measure(self, func, question, repeat):
+        """Return average milliseconds and queries per call of ``func``."""
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func(question)
+            elapsed = time.perf_counter() - start
+        return elapsed * 1000 / repeat, len(queries) / repeat
+
+    def handle(self, *args, **options):
+        """Create each poll inside a transaction, measure it and roll back."""
+        repeat = options['repeat']
+        self.stdout.write(f"{'choices':>8} {'per-choice ms':>14} {'queries':>8} {'tally ms':>9} {'queries':>8}")
+        for size in options['choices']:
+            with transaction.atomic():
+                question = Question.objects.create(question_text="Benchmark", pub_date=timezone.now())
+                User.objects.bulk_create(User(username=f"benchmark-voter-{i}") for i in range(size))
+                Choice.objects.bulk_create(
+                    Choice(question=question, choice_text=f"Choice {i}", vote_count=1) for i in range(size))
+                users = User.objects.filter(username__startswith="benchmark-voter-")
+                Vote.objects.bulk_create(Vote(choice=choice, question=question, user=user)
+                                         for choice, user in zip(question.choice_set.all(), users))
+                old_ms, old_queries = self.measure(per_choice_counts, question, repeat)
+                new_ms, new_queries = self.measure(get_tally, question, repeat)
+                transaction.set_rollback(True)
+            self.stdout.write(f"{size:>8} {old_ms:>14.2f} {old_queries:>8.0f} {new_ms:>9.2f} {new_queries:>8.0f}")
@@ -0,0 +1,47 @@
+"""Management command that folds vote counter shards back into the choice counters."""
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from polls.models import Choice, CounterShard
+
+
+def _deltas(values: dict):
+    """Build a ``CASE pk WHEN ... THEN value`` expression from ``{pk: value}``."""
+    return Case(*(When(pk=pk, then=Value(value)) for pk, value in values.items()),
+                default=Value(0), output_field=IntegerField())
+
+
+class Command(BaseCommand):
+    """Move the counts of counter shards into ``Choice.vote_count`` without changing any vote total."""
+
+    help = "Fold counter shards into Choice.vote_count: manage.py consolidate_vote_shards [--question ID ...]"
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--question', type=int, nargs='+', help="Only consolidate these questions.")
+
+    def handle(self, *args, **options):
+        """Consolidate shards in one transaction.
+
+        Each shard is decreased by the count read, rather than reset, so votes
+        counted while the command runs are kept. Shards left at zero are deleted.
+        """
+        # shards at zero too, as moved votes can bring a shard back to zero
+        shards = CounterShard.objects.all()
+        if options['question']:
+            shards = shards.filter(choice__question_id__in=options['question'])
+        with transaction.atomic():
+            counts = {}
+            totals = defaultdict(int)
+            for pk, choice_id, count in shards.select_for_update().values_list('pk', 'choice_id', 'count'):
+                counts[pk] = count
+                totals[choice_id] += count
+            if not counts:
+                self.stdout.write("No counter shards to consolidate.")
+                return
+            CounterShard.objects.filter(pk__in=counts).update(count=F('count') - _deltas(counts))
+            Choice.objects.filter(pk__in=totals).update(vote_count=F('vote_count') + _deltas(totals))
+            CounterShard.objects.filter(pk__in=counts, count=0).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Consolidated {len(counts)} shard(s) into {len(totals)} choice(s)."))
@@ -0,0 +1,26 @@
+"""Management command that streams polls with their vote tallies to JSON Lines or CSV."""
+from django.core.management.base import BaseCommand
+from polls.transfer import FORMATS, WRITERS, export_polls
+
+
+class Command(BaseCommand):
+    """Write every poll, a chunk of questions at a time."""
+
+    help = "Export polls and vote tallies: manage.py export_polls polls.jsonl (or --format csv, '-' for stdout)."
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('path', nargs='?', default='-', help="File to write, '-' for standard output.")
+        parser.add_argument('--format', choices=FORMATS, help="Output format (default: from the file extension).")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Questions read per query.")
+
+    def handle(self, *args, **options):
+        """Export the polls."""
+        path = options['path']
+        output_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        records = export_polls(chunk_size=options['chunk_size'])
+        if path == '-':
+            WRITERS[output_format](records, self.stdout)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            WRITERS[output_format](records, file)
@@ -0,0 +1,27 @@
+"""Management command that records votes queued by the write-behind ingestion mode."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from polls.ingest import flush, get_ingestion_mode
+
+
+class Command(BaseCommand):
+    """Flush the vote buffer once, or keep flushing it with ``--loop``."""
+
+    help = "Record votes queued in the spool file (POLLS_VOTE_INGESTION = 'file') in batches."
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--loop', action='store_true', help="Keep flushing until interrupted.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between flushes with --loop.")
+
+    def handle(self, *args, **options):
+        """Flush queued votes."""
+        if get_ingestion_mode() != 'file':
+            raise CommandError("Only votes queued in the spool file can be flushed from another process.")
+        while True:
+            flushed = flush()
+            if flushed or options['verbosity'] > 1:
+                self.stdout.write(f"Flushed {flushed} vote(s).")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+"""Management command that creates polls from a JSON Lines or CSV file in batches."""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from polls.transfer import FORMATS, READERS, import_polls
+
+
+class Command(BaseCommand):
+    """Read polls as a stream and insert them with one query per batch of questions and one for their choices."""
+
+    help = "Import polls written by export_polls: manage.py import_polls polls.jsonl (or --format csv, '-' for stdin)."
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('path', help="File to read, '-' for standard input.")
+        parser.add_argument('--format', choices=FORMATS, help="Input format (default: from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Questions inserted per transaction.")
+
+    def handle(self, *args, **options):
+        """Import the polls."""
+        path = options['path']
+        input_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        try:
+            if path == '-':
+                questions, choices = import_polls(READERS[input_format](sys.stdin), options['batch_size'])
+            else:
+                with open(path, newline='', encoding='utf-8') as file:
+                    questions, choices = import_polls(READERS[input_format](file), options['batch_size'])
+        except (OSError, KeyError, ValueError, IntegrityError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f"Imported {questions} question(s) with {choices} choice(s)."))
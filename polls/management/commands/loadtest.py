@@ -0,0 +1,50 @@
+"""Management command that measures requests per second of a running KU Polls server."""
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+
+def fetch(url: str) -> tuple:
+    """Request ``url`` once and return ``(status code, seconds)``."""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    """Send concurrent GET requests to a server, e.g. once under WSGI and once under ASGI."""
+
+    help = "Load test a running server: manage.py loadtest http://127.0.0.1:8000/ --requests 2000 --concurrency 50"
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('urls', nargs='+', help="URLs to request in turn.")
+        parser.add_argument('--requests', type=int, default=1000, help="Total number of requests.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight at once.")
+
+    def handle(self, *args, **options):
+        """Run the load test and print throughput and latency."""
+        urls = options['urls']
+        total = options['requests']
+        fetch(urls[0])  # warm up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, (urls[i % len(urls)] for i in range(total))))
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for status, _ in results if not 200 <= status < 400)
+        if failed == total:
+            raise CommandError("Every request failed, is the server running?")
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        self.stdout.write(f"{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s, {failed} failed")
+        self.stdout.write(f"latency ms: p50 {statistics.median(latencies):.1f}, "
+                          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}, max {latencies[-1]:.1f}")
@@ -0,0 +1,37 @@
+"""Management command that deletes expired database sessions in batches."""
+import time
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """Delete expired sessions a batch at a time, so the table is never locked for long.
+
+    Unlike ``clearsessions``, which deletes every expired row in one statement.
+    """
+
+    help = "Delete expired database sessions in batches: manage.py purge_sessions --batch-size 1000 --pause 0.1"
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--batch-size', type=int, default=1000, help="Sessions deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        """Delete batches of expired sessions until none is left."""
+        if settings.SESSION_ENGINE.rsplit('.', 1)[-1] not in ('db', 'cached_db'):
+            self.stdout.write(f"{settings.SESSION_ENGINE} does not store sessions in the database.")
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by('pk').values_list('pk', flat=True)
+        deleted = batches = 0
+        while True:
+            keys = list(expired[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(pk__in=keys).delete()[0]
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired session(s) in {batches} batch(es)."))
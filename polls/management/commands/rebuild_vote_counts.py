@@ -0,0 +1,39 @@
+"""Management command that rebuilds the stored vote counter of every choice."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from polls.cache import bump_version
+from polls.models import Choice, CounterShard, Vote
+
+
+class Command(BaseCommand):
+    """Compare choice counters (with their shards) with the Vote table and repair them."""
+
+    help = "Rebuild Choice.vote_count from the Vote table and clear counter shards (use --check to only report drift)."
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--check', action='store_true',
+                            help="Only report choices whose counter differs from the Vote table.")
+
+    def handle(self, *args, **options):
+        """Report drifted counters and rebuild them unless ``--check`` is given."""
+        counted = Vote.objects.filter(choice=OuterRef('pk')).values('choice')\
+            .annotate(total=Count('pk')).values('total')
+        actual = Coalesce(Subquery(counted), 0)
+        with transaction.atomic():
+            drifted = list(Choice.objects.with_votes().annotate(actual=actual).exclude(vote_total=F('actual'))
+                           .values_list('pk', 'question_id', 'vote_total', 'actual'))
+            for pk, _, stored, real in drifted:
+                self.stdout.write(f"Choice {pk}: stored {stored}, counted {real}")
+            if options['check']:
+                if drifted:
+                    raise CommandError(f"{len(drifted)} choice counter(s) out of sync.")
+                self.stdout.write(self.style.SUCCESS("All vote counters are in sync."))
+                return
+            Choice.objects.update(vote_count=actual)
+            CounterShard.objects.all().delete()
+        for question_id in {question_id for _, question_id, _, _ in drifted}:
+            bump_version(question_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt vote counters, {len(drifted)} choice(s) repaired."))
@@ -0,0 +1,126 @@
+"""Management command that measures vote throughput of several processes writing one SQLite database."""
+import multiprocessing
+import queue
+import random
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from polls.models import Choice, Question, Vote
+from polls.voting import record_vote
+
+PROFILES = {
+    # SQLite defaults (rollback journal, synchronous=FULL) and no retry, as before the production profile.
+    'default': {'journal_mode': 'DELETE', 'SQLITE_PRODUCTION': False, 'POLLS_VOTE_LOCK_RETRIES': 0},
+    'production': {'journal_mode': 'WAL', 'SQLITE_PRODUCTION': True, 'POLLS_VOTE_LOCK_RETRIES': 5},
+}
+
+
+def vote_worker(profile: str, seed: int, user_ids: list, choice_ids: list, votes: int, results):
+    """Cast ``votes`` random votes in a forked process and report ``(recorded, failed, seconds)``.
+
+    The report is sent even if the worker crashes, with the votes it did not cast as failed.
+    """
+    recorded = 0
+    start = time.perf_counter()
+    try:
+        for name, value in PROFILES[profile].items():
+            if name.isupper():
+                setattr(settings, name, value)
+        rng = random.Random(seed)
+        users = list(User.objects.filter(pk__in=user_ids))
+        choices = list(Choice.objects.filter(pk__in=choice_ids))
+        for _ in range(votes):
+            try:
+                record_vote(rng.choice(users), rng.choice(choices))
+                recorded += 1
+            except OperationalError:
+                pass
+    finally:
+        results.put((recorded, votes - recorded, time.perf_counter() - start))
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Run the same vote storm under the default and the production SQLite profile."""
+
+    help = ("Stress test votes from several processes: manage.py stress_votes --processes 8 --votes 500. "
+            "Creates a throwaway poll and voters, and removes them afterwards.")
+
+    def add_arguments(self, parser):
+        """Add command line options."""
+        parser.add_argument('--processes', type=int, default=4, help="Processes voting at once.")
+        parser.add_argument('--votes', type=int, default=200, help="Votes cast by each process.")
+        parser.add_argument('--users', type=int, default=10, help="Voters per process.")
+        parser.add_argument('--timeout', type=float, default=600,
+                            help="Seconds to wait for the voters of a profile before giving up.")
+        parser.add_argument('--profile', action='append', choices=PROFILES, dest='profiles',
+                            help="Profile to run, can be repeated (default: default, then production).")
+
+    def handle(self, *args, **options):
+        """Create the poll, run each profile and report throughput."""
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError("The stress test needs a SQLite database file.")
+        processes = options['processes']
+        question = Question.objects.create(question_text="Stress test", pub_date=timezone.now())
+        choice_ids = [Choice.objects.create(question=question, choice_text=f"Choice {i}").pk for i in range(3)]
+        prefix = f"stress-{time.time_ns()}-"
+        User.objects.bulk_create(User(username=f"{prefix}{i}") for i in range(processes * options['users']))
+        user_ids = list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        try:
+            for profile in options['profiles'] or ['default', 'production']:
+                self.run_profile(profile, processes, options['votes'], user_ids, choice_ids, options['timeout'])
+            self.check_counters(question)
+        finally:
+            Vote.objects.filter(question=question).delete()
+            question.delete()
+            User.objects.filter(pk__in=user_ids).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+
+    def run_profile(self, profile: str, processes: int, votes: int, user_ids: list, choice_ids: list,
+                    timeout: float = 600):
+        """Fork ``processes`` voters under ``profile`` and print their combined throughput."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={PROFILES[profile]['journal_mode']}")
+        # SQLite connections must not cross a fork: every process opens its own.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=vote_worker,
+                                   args=(profile, i, user_ids[i::processes], choice_ids, votes, results))
+                   for i in range(processes)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        deadline = time.monotonic() + timeout
+        try:
+            reports = [results.get(timeout=max(0, deadline - time.monotonic())) for _ in workers]
+        except queue.Empty:
+            for worker in workers:
+                worker.terminate()
+            raise CommandError(f"Voters of the {profile} profile did not finish within {timeout:g}s.")
+        elapsed = time.perf_counter() - start
+        for worker in workers:
+            worker.join()
+        recorded = sum(report[0] for report in reports)
+        failed = sum(report[1] for report in reports)
+        self.stdout.write(f"{profile:>10}: {recorded} votes in {elapsed:.2f}s, {recorded / elapsed:.0f} votes/s, "
+                          f"{failed} failed")
+
+    def check_counters(self, question):
+        """Check that the choice counters match the vote rows after the storm."""
+        counted = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk'))\
+            .values('total')
+        drifted = question.choice_set.with_votes().annotate(actual=Coalesce(Subquery(counted), 0))\
+            .exclude(vote_total=F('actual')).count()
+        if drifted:
+            raise CommandError(f"{drifted} choice counter(s) do not match the votes.")
+        self.stdout.write(self.style.SUCCESS("Choice counters match the votes."))
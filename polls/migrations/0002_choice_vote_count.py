@@ -0,0 +1,29 @@
+# Generated by Django 3.2.7 on 2026-10-18 17:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_count(apps, schema_editor):
+    """Fill the new counter from the existing Vote rows."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    counted = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.update(vote_count=Coalesce(Subquery(counted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votes'),
+        ),
+        migrations.RunPython(backfill_vote_count, migrations.RunPython.noop),
+    ]
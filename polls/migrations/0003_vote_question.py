@@ -0,0 +1,64 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_vote_question(apps, schema_editor):
+    """Copy the question of each vote's choice onto the vote."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question=Subquery(Choice.objects.filter(pk=OuterRef('choice')).values('question')[:1]))
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user in each question and recount choices."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    newer = Vote.objects.filter(user=OuterRef('user'), question=OuterRef('question'), pk__gt=OuterRef('pk'))
+    duplicates = list(Vote.objects.filter(Exists(newer)).values_list('pk', flat=True))
+    if not duplicates:
+        return
+    Vote.objects.filter(pk__in=duplicates).delete()
+    counted = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.update(vote_count=Coalesce(Subquery(counted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0002_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(backfill_vote_question, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_vote_per_question'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='end_date',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True, verbose_name='End date'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='pub_date',
+            field=models.DateTimeField(db_index=True, verbose_name='Date published'),
+        ),
+    ]
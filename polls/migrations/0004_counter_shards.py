@@ -0,0 +1,33 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:28
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Spread the vote counter of each choice over this many rows, for polls that get many votes at once (e.g. in a live lecture). 1 keeps a single counter.', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(64)], verbose_name='Vote counter shards'),
+        ),
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='polls.choice')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='countershard',
+            constraint=models.UniqueConstraint(fields=('choice', 'shard'), name='unique_counter_shard'),
+        ),
+    ]
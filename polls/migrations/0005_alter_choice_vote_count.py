@@ -0,0 +1,18 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_counter_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='choice',
+            name='vote_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Votes'),
+        ),
+    ]
@@ -1,47 +1,124 @@
 """Module contains models for polls app (similar to database)."""
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import admin
 import django.contrib.auth.models
 
 
+class QuestionStatus(models.IntegerChoices):
+    """Status of a question at a moment, ordered the way the index lists them."""
+
+    SCHEDULED = 0, 'Scheduled'
+    OPEN = 1, 'Open'
+    CLOSED = 2, 'Closed'
+
+
+class QuestionQuerySet(models.QuerySet):
+    """Queryset that computes question status in the database from one shared ``now``."""
+
+    def with_status(self, now=None):
+        """Annotate each question with its ``QuestionStatus`` as ``status``."""
+        now = now or timezone.now()
+        return self.annotate(status=Case(
+            When(pub_date__gt=now, then=Value(QuestionStatus.SCHEDULED)),
+            When(end_date__lte=now, then=Value(QuestionStatus.CLOSED)),
+            default=Value(QuestionStatus.OPEN),
+            output_field=models.IntegerField(),
+        ))
+
+    def published(self, now=None):
+        """Get questions that are open or closed."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now).with_status(now)
+
+    def open(self, now=None):
+        """Get questions that can be voted."""
+        now = now or timezone.now()
+        return self.filter(Q(end_date__isnull=True) | Q(end_date__gt=now), pub_date__lte=now).with_status(now)
+
+    def closed(self, now=None):
+        """Get questions that have ended."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__lte=now).with_status(now)
+
+    def scheduled(self, now=None):
+        """Get questions that are not published yet."""
+        now = now or timezone.now()
+        return self.filter(pub_date__gt=now).with_status(now)
+
+
 class Question(models.Model):
     """Model for Question, composed of question text, publish date, and end date."""
 
     question_text = models.CharField(max_length=200)
-    pub_date = models.DateTimeField('Date published')
-    end_date = models.DateTimeField('End date', default=None, blank=True, null=True)
+    pub_date = models.DateTimeField('Date published', db_index=True)
+    end_date = models.DateTimeField('End date', default=None, blank=True, null=True, db_index=True)
+    counter_shards = models.PositiveSmallIntegerField(
+        'Vote counter shards', default=1, validators=[MinValueValidator(1), MaxValueValidator(64)],
+        help_text="Spread the vote counter of each choice over this many rows, for polls that get many votes "
+                  "at once (e.g. in a live lecture). 1 keeps a single counter.")
+
+    objects = QuestionQuerySet.as_manager()
 
     def __str__(self):
         """Generate output for question object."""
         return self.question_text
 
+    def get_status(self, now=None) -> QuestionStatus:
+        """Get status from the ``with_status`` annotation, or from the clock when not annotated."""
+        if getattr(self, 'status', None) is not None:
+            return self.status
+        now = now or timezone.now()
+        if self.pub_date > now:
+            return QuestionStatus.SCHEDULED
+        if self.end_date is not None and self.end_date <= now:
+            return QuestionStatus.CLOSED
+        return QuestionStatus.OPEN
+
     @admin.display(
         boolean=True,
         description='Published recently?',
+        ordering='pub_date',
     )
     def is_published(self):
         """Check that question can be displayed."""
-        now = timezone.now()
-        return self.pub_date <= now
+        return self.get_status() != QuestionStatus.SCHEDULED
 
     @admin.display(
         boolean=True,
         description='Can be vote?',
+        ordering='status',
     )
     def can_vote(self):
         """Check that question still can be vote."""
-        now = timezone.now()
-        if self.end_date is None:
-            return self.pub_date < now
-        return self.pub_date <= now < self.end_date
+        return self.get_status() == QuestionStatus.OPEN
+
+
+class ChoiceQuerySet(models.QuerySet):
+    """Queryset that adds the shard counters of each choice to its stored counter."""
+
+    def with_votes(self):
+        """Annotate each choice with its number of votes as ``vote_total``."""
+        shards = CounterShard.objects.filter(choice=OuterRef('pk')).values('choice')\
+            .annotate(total=Sum('count')).values('total')
+        return self.annotate(vote_total=F('vote_count') + Coalesce(Subquery(shards), 0))
 
 
 class Choice(models.Model):
-    """Model for Choice, composed of choice text, amount of votes, and question object."""
+    """Model for Choice, composed of choice text, amount of votes, and question object.
+
+    Like a shard, ``vote_count`` may go below zero once the question has fewer
+    shards than it had votes on them, as moved votes are then taken from it.
+    """
 
     choice_text = models.CharField(max_length=200)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    vote_count = models.IntegerField('Votes', default=0, editable=False)
+
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Generate output for choice object."""
@@ -49,16 +126,56 @@ class Choice(models.Model):
 
     @property
     def votes(self) -> int:
-        """Get all votes for choice."""
-        return Vote.objects.filter(choice=self).count()
+        """Get all votes for choice from the stored counter and its shards."""
+        if getattr(self, 'vote_total', None) is not None:
+            return self.vote_total
+        return self.vote_count + (self.shards.aggregate(total=Sum('count'))['total'] or 0)
+
+
+class CounterShard(models.Model):
+    """Part of the vote counter of a choice whose question has more than one counter shard.
+
+    A vote adds 1 to a random shard, so concurrent votes for the same choice
+    update different rows instead of waiting for one row lock. A shard may go
+    below zero when votes move away from the choice; only the sum matters.
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """Allow one row per shard of each choice."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'], name='unique_counter_shard'),
+        ]
+
+    def __str__(self):
+        """Return shard number and count."""
+        return f"Shard {self.shard} of choice {self.choice_id}: {self.count}"
 
 
 class Vote(models.Model):
-    """Model for conducting user voted in each choice."""
+    """Model for conducting user voted in each choice, at most one per user and question."""
 
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     user = models.ForeignKey(django.contrib.auth.models.User, on_delete=models.CASCADE, null=False, blank=False)
 
+    class Meta:
+        """Allow only one vote per user in each question."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_vote_per_question'),
+        ]
+
     def __str__(self):
         """Return value of choice selected."""
-        return f"{self.user.username} votes for {self.choice.choice_text} in {self.choice.question.question_text}."
+        return f"{self.user.username} votes for {self.choice.choice_text} in {self.question.question_text}."
+
+    def save(self, *args, **kwargs):
+        """Copy the question from the selected choice before saving."""
+        if self.choice_id is not None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
@@ -0,0 +1,91 @@
+"""Module contains keyset pagination for the poll index."""
+import datetime
+from django.db.models import Q
+from .models import QuestionStatus
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(question) -> str:
+    """Encode the sort key of a question annotated with status as a cursor string."""
+    micros = (question.pub_date - EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{question.status}.{micros}.{question.pk}"
+
+
+def decode_cursor(cursor):
+    """Decode a cursor string into ``(status, pub_date, pk)``, or None when it is invalid."""
+    try:
+        status, micros, pk = (int(part) for part in cursor.split('.'))
+    except (AttributeError, ValueError):
+        return None
+    if status not in QuestionStatus.values or not -2 ** 63 <= pk < 2 ** 63:
+        # a key outside the 64-bit range of the database column cannot be queried
+        return None
+    try:
+        return status, EPOCH + datetime.timedelta(microseconds=micros), pk
+    except OverflowError:
+        return None
+
+
+def after_cursor(queryset, cursor):
+    """Filter questions ordered by ``status, -pub_date, -pk`` to those after ``cursor``."""
+    status, pub_date, pk = cursor
+    return queryset.filter(
+        Q(status__gt=status)
+        | Q(status=status, pub_date__lt=pub_date)
+        | Q(status=status, pub_date=pub_date, pk__lt=pk)
+    )
+
+
+class KeysetPage:
+    """A page of questions that is only read from the database when it is used.
+
+    The index template renders the page inside a fragment cache, so on a cache
+    hit the page is never evaluated and no query is made.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, size: int):
+        """Initialize page with an ordered queryset and page size."""
+        self.queryset = queryset
+        self.size = size
+        self._items = None
+        self._has_next = False
+
+    def _fetch(self):
+        """Read one row more than the page size to know whether a next page exists."""
+        if self._items is None:
+            rows = list(self.queryset[:self.size + 1])
+            self._items = rows[:self.size]
+            self._has_next = len(rows) > self.size
+        return self._items
+
+    def __iter__(self):
+        """Iterate questions in the page."""
+        return iter(self._fetch())
+
+    def __len__(self):
+        """Get number of questions in the page."""
+        return len(self._fetch())
+
+    def __bool__(self):
+        """Check that the page has questions."""
+        return bool(self._fetch())
+
+    def __getitem__(self, index):
+        """Get question by position in the page."""
+        return self._fetch()[index]
+
+    @property
+    def has_next(self) -> bool:
+        """Check that another page follows this one."""
+        self._fetch()
+        return self._has_next
+
+    @property
+    def next_cursor(self) -> str:
+        """Get the cursor of the next page, or empty string on the last page."""
+        if not self.has_next:
+            return ''
+        return encode_cursor(self._items[-1])
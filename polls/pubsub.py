@@ -0,0 +1,144 @@
+"""Module contains the publish/subscribe channel that tells live results about new votes.
+
+The vote path publishes on ``question:<id>`` whenever the tally of a question
+changes, and every open results stream of that question wakes up. The broker
+class is set by ``POLLS_PUBSUB_BROKER``:
+
+* ``polls.pubsub.InProcessBroker`` (default) delivers messages to streams served
+  by the same process.
+* ``polls.pubsub.CacheBroker`` goes through the configured cache, so with a
+  shared cache (e.g. ``filecache://``) votes in one worker reach streams in another.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .cache import get_results_cache
+
+CHANNEL_KEY = 'polls:pubsub:{}'
+
+
+class Subscription:
+    """Messages of one channel for one subscriber."""
+
+    def __init__(self, broker, channel: str):
+        """Initialize subscription of ``channel``."""
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.SimpleQueue()
+
+    def get(self, timeout: float):
+        """Wait up to ``timeout`` seconds for the next message and return it, or None."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop receiving messages."""
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        """Use subscription as context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close subscription when leaving the context."""
+        self.close()
+
+
+class InProcessBroker:
+    """Broker that delivers messages to subscribers in the current process."""
+
+    def __init__(self):
+        """Initialize broker without subscribers."""
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel: str, message):
+        """Send ``message`` to every subscriber of ``channel``."""
+        with self._lock:
+            subscriptions = list(self._subscriptions[channel])
+        for subscription in subscriptions:
+            subscription.queue.put(message)
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Start receiving messages of ``channel``."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop delivering messages to ``subscription``."""
+        with self._lock:
+            self._subscriptions[subscription.channel].discard(subscription)
+            if not self._subscriptions[subscription.channel]:
+                del self._subscriptions[subscription.channel]
+
+
+class CacheSubscription(Subscription):
+    """Subscription that polls the last message stored in the cache."""
+
+    def __init__(self, broker, channel: str):
+        """Initialize subscription and remember the current message."""
+        super().__init__(broker, channel)
+        self.last = get_results_cache().get(CHANNEL_KEY.format(channel))
+
+    def get(self, timeout: float):
+        """Poll the cache until the message changes or ``timeout`` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            message = get_results_cache().get(CHANNEL_KEY.format(self.channel))
+            if message != self.last:
+                self.last = message
+                return message
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.broker.poll_interval, remaining))
+
+
+class CacheBroker:
+    """Broker that stores the last message of each channel in the cache, shared by all workers."""
+
+    def __init__(self):
+        """Initialize broker with the configured polling interval."""
+        self.poll_interval = getattr(settings, 'POLLS_PUBSUB_POLL_INTERVAL', 0.5)
+
+    def publish(self, channel: str, message):
+        """Store ``message`` as the latest message of ``channel``."""
+        get_results_cache().set(CHANNEL_KEY.format(channel), message, None)
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Start watching ``channel``."""
+        return CacheSubscription(self, channel)
+
+    def unsubscribe(self, subscription: Subscription):
+        """Nothing to release, subscribers only read the cache."""
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Get the broker configured by ``POLLS_PUBSUB_BROKER``, one per process."""
+    global _broker
+    broker_class = import_string(getattr(settings, 'POLLS_PUBSUB_BROKER', 'polls.pubsub.InProcessBroker'))
+    with _broker_lock:
+        if _broker.__class__ is not broker_class:
+            _broker = broker_class()
+        return _broker
+
+
+def question_channel(question_id: int) -> str:
+    """Get the channel name of a question."""
+    return f"question:{question_id}"
+
+
+def publish_results(question_id: int, version):
+    """Announce that the tally of a question changed to ``version``."""
+    get_broker().publish(question_channel(question_id), version)
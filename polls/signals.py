@@ -0,0 +1,32 @@
+"""Module contains signal receivers that keep polls caches and vote counters up to date."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import bump_index_generation, bump_version
+from .models import Question, Choice, Vote
+from .voting import add_votes
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Discard the cached poll index and the question's results when a question is saved or deleted."""
+    bump_index_generation()
+    bump_version(instance.pk)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """Discard the cached results of a question when one of its choices is saved or deleted."""
+    bump_version(instance.question_id)
+
+
+@receiver(post_delete, sender=Vote)
+def vote_deleted(sender, instance, **kwargs):
+    """Take a vote deleted outside the vote view (e.g. with its user) off its choice's counter and results.
+
+    The vote is taken off the choice counter rather than a shard, so a choice
+    being deleted in the same cascade never gets a new shard row.
+    """
+    add_votes(instance.choice_id, 1, -1)
+    bump_version(instance.question_id)
@@ -0,0 +1,50 @@
+"""Module contains the vote tally service shared by results page and JSON API."""
+from .models import Choice
+
+
+class TallyRow:
+    """One choice in a tally with its vote count and share of the total."""
+
+    def __init__(self, choice_id: int, label: str, votes: int, total: int):
+        """Initialize row from the values read from the database."""
+        self.choice_id = choice_id
+        self.label = label
+        self.votes = votes
+        self.percent = round(votes * 100 / total, 1) if total else 0.0
+
+    def as_dict(self) -> dict:
+        """Return the row as a JSON serializable dict."""
+        return {'id': self.choice_id, 'label': self.label, 'votes': self.votes, 'percent': self.percent}
+
+
+class Tally:
+    """Vote tally of a question, built from a single query over its choices."""
+
+    def __init__(self, question_id: int, values):
+        """Initialize tally from ``(choice id, choice text, votes)`` tuples."""
+        values = list(values)
+        self.question_id = question_id
+        self.total = sum(votes for _, _, votes in values)
+        self.rows = [TallyRow(pk, label, votes, self.total) for pk, label, votes in values]
+
+    @property
+    def labels(self) -> list:
+        """Get the choice texts in display order."""
+        return [row.label for row in self.rows]
+
+    @property
+    def counts(self) -> list:
+        """Get the vote counts in display order."""
+        return [row.votes for row in self.rows]
+
+    def as_dict(self) -> dict:
+        """Return the tally as a JSON serializable dict."""
+        return {'question': self.question_id, 'total': self.total, 'choices': [row.as_dict() for row in self.rows]}
+
+
+def get_tally(question) -> Tally:
+    """Count the votes of every choice in ``question`` (a Question or its id) with one query."""
+    question_id = getattr(question, 'pk', question)
+    values = Choice.objects.filter(question_id=question_id).with_votes().order_by('pk')\
+        .values_list('pk', 'choice_text', 'vote_total')
+    return Tally(question_id, values)
@@ -0,0 +1,118 @@
+"""Test that admin lists load in a fixed number of queries."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.admin import EstimatedCountPaginator
+from polls.models import Choice, Vote
+from polls.voting import record_vote
+from .test_questions import create_question
+
+
+class AdminChangelistTests(TestCase):
+    """Test for the question, choice and vote lists in the admin site."""
+
+    def setUp(self):
+        """Log in as superuser."""
+        self.admin = User.objects.create_superuser(username="admin", password="HelloIamhere!")
+        self.client.force_login(self.admin)
+
+    def create_polls(self, size):
+        """Create ``size`` questions with two choices and a vote on the first one."""
+        for i in range(size):
+            question = create_question(question_text=f"Question {i}", days=-1)
+            choice = Choice.objects.create(question=question, choice_text="Yes")
+            Choice.objects.create(question=question, choice_text="No")
+            record_vote(User.objects.create_user(username=f"voter-{size}-{i}"), choice)
+
+    def count_queries(self, url):
+        """Get the number of queries of one request to ``url``."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(200, self.client.get(url).status_code)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        """Check that the list costs as many queries with 2 rows as with 20."""
+        self.create_polls(2)
+        small = self.count_queries(url)
+        self.create_polls(18)
+        self.assertEqual(small, self.count_queries(url))
+
+    def test_question_totals(self):
+        """Question list shows the vote total of each question and can sort by it."""
+        self.create_polls(1)
+        question = create_question(question_text="Popular", days=-1)
+        choice = Choice.objects.create(question=question, choice_text="Yes")
+        for i in range(3):
+            record_vote(User.objects.create_user(username=f"fan-{i}"), choice)
+        response = self.client.get(reverse('admin:polls_question_changelist'), {'o': '-6'})
+        questions = list(response.context['cl'].result_list)
+        self.assertEqual(["Popular", "Question 0"], [question.question_text for question in questions])
+        self.assertEqual([3, 1], [question.total for question in questions])
+
+    def test_question_queries(self):
+        """Question list queries do not grow with its rows."""
+        self.assertConstantQueries(reverse('admin:polls_question_changelist'))
+
+    def test_choice_queries(self):
+        """Choice list queries do not grow with its rows."""
+        self.assertConstantQueries(reverse('admin:polls_choice_changelist'))
+
+    def test_vote_queries(self):
+        """Vote list queries do not grow with its rows."""
+        self.assertConstantQueries(reverse('admin:polls_vote_changelist'))
+
+    def test_choice_stays_in_question(self):
+        """A choice can be given a question when added, but not moved to another one."""
+        self.create_polls(1)
+        choice = Choice.objects.get(choice_text="Yes")
+        other = create_question(question_text="Other", days=-1)
+        self.assertContains(self.client.get(reverse('admin:polls_choice_add')), 'name="question"')
+        url = reverse('admin:polls_choice_change', args=[choice.pk])
+        self.assertNotContains(self.client.get(url), 'name="question"')
+        self.client.post(url, {'choice_text': "Yes", 'question': other.pk})
+        self.assertEqual(choice.question_id, Choice.objects.get(pk=choice.pk).question_id)
+
+    def test_votes_read_only(self):
+        """Votes can be viewed but not added, changed or deleted."""
+        self.create_polls(1)
+        vote = Vote.objects.get()
+        self.assertEqual(403, self.client.get(reverse('admin:polls_vote_add')).status_code)
+        self.assertEqual(403, self.client.get(reverse('admin:polls_vote_delete', args=[vote.pk])).status_code)
+        url = reverse('admin:polls_vote_change', args=[vote.pk])
+        self.assertNotContains(self.client.get(url), 'name="_save"')
+        self.assertEqual(403, self.client.post(url, {'choice': vote.choice_id}).status_code)
+        self.client.post(reverse('admin:polls_vote_changelist'),
+                         {'action': 'delete_selected', '_selected_action': [vote.pk]})
+        self.assertTrue(Vote.objects.filter(pk=vote.pk).exists())
+        self.assertEqual(1, Choice.objects.get(pk=vote.choice_id).votes)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Test for the paginator of the vote list."""
+
+    def setUp(self):
+        """Create five votes."""
+        question = create_question(question_text="Question", days=-1)
+        choice = Choice.objects.create(question=question, choice_text="Yes")
+        for i in range(5):
+            record_vote(User.objects.create_user(username=f"voter-{i}"), choice)
+
+    @override_settings(POLLS_ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_estimate(self):
+        """Big unfiltered tables are estimated from the highest key in one cheap query."""
+        Vote.objects.order_by('pk').first().delete()
+        paginator = EstimatedCountPaginator(Vote.objects.order_by('pk'), 100)
+        self.assertEqual(5, paginator.count)
+
+    @override_settings(POLLS_ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_filtered_exact(self):
+        """Filtered lists are counted exactly."""
+        paginator = EstimatedCountPaginator(Vote.objects.filter(user__username="voter-1").order_by('pk'), 100)
+        self.assertEqual(1, paginator.count)
+
+    def test_small_exact(self):
+        """Tables below the limit are counted exactly."""
+        Vote.objects.order_by('pk').first().delete()
+        self.assertEqual(4, EstimatedCountPaginator(Vote.objects.order_by('pk'), 100).count)
@@ -0,0 +1,86 @@
+"""Test the read-only JSON API and its conditional GET support."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Choice
+from .test_questions import create_question
+
+
+class PollApiTests(TestCase):
+    """Test for JSON API endpoints."""
+
+    def setUp(self):
+        """Create open, ended and future questions."""
+        cache.clear()
+        self.question = create_question(question_text="Question1", days=-1)
+        self.ended_question = create_question(question_text="Question2", days=-10, end_day=-5)
+        self.future_question = create_question(question_text="Question3", days=10)
+        self.choice1 = Choice.objects.create(choice_text="1", question=self.question)
+        self.choice2 = Choice.objects.create(choice_text="2", question=self.question)
+
+    def test_list_open_polls(self):
+        """List contains only polls that can be voted."""
+        response = self.client.get(reverse('polls:api_polls'))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([self.question.id], [poll['id'] for poll in response.json()['polls']])
+
+    def test_detail(self):
+        """Detail contains question and its choices."""
+        response = self.client.get(reverse('polls:api_poll', args=[self.question.id]))
+        data = response.json()
+        self.assertEqual("Question1", data['question_text'])
+        self.assertTrue(data['can_vote'])
+        self.assertEqual(["1", "2"], [choice['choice_text'] for choice in data['choices']])
+
+    def test_detail_of_ended_and_future_polls(self):
+        """Ended polls can be read, future polls cannot."""
+        response = self.client.get(reverse('polls:api_poll', args=[self.ended_question.id]))
+        self.assertFalse(response.json()['can_vote'])
+        response = self.client.get(reverse('polls:api_poll', args=[self.future_question.id]))
+        self.assertEqual(404, response.status_code)
+
+    def test_results(self):
+        """Results contain counts and total."""
+        data = self.client.get(reverse('polls:api_results', args=[self.question.id])).json()
+        self.assertEqual(0, data['total'])
+        self.assertEqual([0, 0], [choice['votes'] for choice in data['choices']])
+
+    def test_not_modified_without_queries(self):
+        """Sending the ETag back returns 304 without touching the database."""
+        url = reverse('polls:api_results', args=[self.question.id])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+
+    def test_vote_changes_etag(self):
+        """A vote makes the old ETag stale."""
+        url = reverse('polls:api_results', args=[self.question.id])
+        etag = self.client.get(url)['ETag']
+        user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.force_login(user)
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, response.json()['total'])
+
+    def test_choice_edit_changes_etag(self):
+        """Editing a choice makes the old ETag stale."""
+        url = reverse('polls:api_poll', args=[self.question.id])
+        etag = self.client.get(url)['ETag']
+        self.choice1.choice_text = "One"
+        self.choice1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("One", response.json()['choices'][0]['choice_text'])
+
+    def test_list_not_modified(self):
+        """Poll list returns 304 until a question changes."""
+        url = reverse('polls:api_polls')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(304, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code)
+        create_question(question_text="Question4", days=-1)
+        self.assertEqual(200, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code)
@@ -0,0 +1,59 @@
+"""Test async variants of the polls views."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import async_views
+from polls.models import Choice, Vote
+from .test_questions import create_question
+
+
+@override_settings(ROOT_URLCONF='polls.tests.urls_async')
+class AsyncViewTests(TestCase):
+    """Test that async views behave like the sync ones."""
+
+    def setUp(self):
+        """Create questions, choices and a user."""
+        cache.clear()
+        self.question = create_question(question_text="Question1", days=0)
+        self.ended_question = create_question(question_text="Question2", days=-10, end_day=-5)
+        self.choice = Choice.objects.create(choice_text="1", question=self.question)
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+
+    def test_views_are_async(self):
+        """The configured views are coroutine functions."""
+        self.assertEqual(async_views.index, self.client.get(reverse('polls:index')).resolver_match.func)
+
+    def test_index(self):
+        """Index lists published questions."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Question1")
+        self.assertContains(response, "Question2")
+
+    def test_detail(self):
+        """Detail shows open question and rejects ended question."""
+        self.assertContains(self.client.get(reverse('polls:detail', args=[self.question.id])), "Question1")
+        self.assertEqual(404, self.client.get(reverse('polls:detail', args=[self.ended_question.id])).status_code)
+
+    def test_vote_requires_login(self):
+        """Anonymous vote redirects to login page."""
+        response = self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice.id})
+        self.assertEqual(302, response.status_code)
+        self.assertIn('/accounts/login/', response.url)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_and_results(self):
+        """Vote is recorded and shown on results page."""
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice.id})
+        self.assertRedirects(response, reverse('polls:results', args=[self.question.id]))
+        response = self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertEqual([1], response.context['data'])
+        response = self.client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertEqual(self.choice, response.context['voted'])
+
+    def test_vote_without_choice(self):
+        """Vote without a choice shows error message."""
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('polls:vote', args=[self.question.id]))
+        self.assertContains(response, "Please select a choice")
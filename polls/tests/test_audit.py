@@ -0,0 +1,118 @@
+"""Tests of the audit log."""
+import json
+import logging
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from mysite.audit import AsyncRotatingFileHandler, JSONFormatter, SamplingFilter
+from polls.models import Choice
+from .test_questions import create_question
+
+
+def make_record(event, level=logging.INFO, **fields):
+    """Build the record ``audit()`` would log."""
+    record = logging.LogRecord('mysite.audit', level, __file__, 1, event, None, None)
+    record.audit = {'event': event, **fields}
+    return record
+
+
+class AuditEventTests(TestCase):
+    """Test the events written by votes and logins."""
+
+    def setUp(self):
+        """Create a user and a poll."""
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.question = create_question(question_text="Secret question text", days=-1)
+        self.choice = Choice.objects.create(question=self.question, choice_text="Secret choice text")
+
+    def test_vote(self):
+        """A vote is logged with ids only."""
+        self.client.force_login(self.user)
+        with self.assertLogs('mysite.audit', 'INFO') as logs:
+            self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice.id})
+        self.assertEqual({'event': 'vote', 'question': self.question.id, 'choice': self.choice.id,
+                          'user': self.user.pk}, logs.records[-1].audit)
+        self.assertNotIn("Secret", JSONFormatter().format(logs.records[-1]))
+
+    def test_login_failed(self):
+        """A failed login is a warning with the username and IP address."""
+        with self.assertLogs('mysite.audit', 'WARNING') as logs:
+            self.client.post(reverse('login'), {'username': "voter", 'password': "wrong"})
+        self.assertEqual({'event': 'login_failed', 'username': "voter", 'ip': "127.0.0.1"}, logs.records[0].audit)
+
+
+class AuditLoggingTests(SimpleTestCase):
+    """Test the formatter, filter and handler of the audit log."""
+
+    def test_json(self):
+        """Records become one JSON object with their fields."""
+        data = json.loads(JSONFormatter().format(make_record('vote', question=1, choice=2, user=3)))
+        self.assertEqual(('INFO', 'vote', 1, 2, 3), (data['level'], data['event'], data['question'], data['choice'],
+                                                     data['user']))
+        self.assertIn('time', data)
+
+    def test_sampling(self):
+        """Sampled events keep their rate; other events and warnings are always kept."""
+        sampling = SamplingFilter({'vote': 0.25, 'login_failed': 0.0})
+        with mock.patch('mysite.audit.random.random', return_value=0.5):
+            self.assertFalse(sampling.filter(make_record('vote')))
+        with mock.patch('mysite.audit.random.random', return_value=0.1):
+            record = make_record('vote')
+            self.assertTrue(sampling.filter(record))
+        self.assertEqual(0.25, json.loads(JSONFormatter().format(record))['sample_rate'])
+        self.assertTrue(sampling.filter(make_record('login')))
+        self.assertTrue(sampling.filter(make_record('login_failed', logging.WARNING)))
+
+    def test_rotating_file(self):
+        """The listener thread writes JSON lines and rotates the file."""
+        with tempfile.TemporaryDirectory() as directory:
+            handler = AsyncRotatingFileHandler(os.path.join(directory, 'audit-{pid}.log'), maxBytes=300,
+                                               backupCount=2)
+            path = os.path.join(directory, f'audit-{os.getpid()}.log')
+            handler.setFormatter(JSONFormatter())
+            try:
+                for user in range(10):
+                    handler.handle(make_record('vote', question=1, choice=1, user=user))
+                handler.flush()
+                with open(path) as file:
+                    lines = [json.loads(line) for line in file]
+            finally:
+                handler.close()
+            self.assertTrue(os.path.exists(path + '.1'))
+            self.assertEqual(9, lines[-1]['user'])
+
+    def test_shared_file(self):
+        """A file shared by workers is not rotated by them, and is reopened after being moved."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'audit.log')
+            handler = AsyncRotatingFileHandler(path, maxBytes=300, backupCount=2)
+            handler.setFormatter(JSONFormatter())
+            try:
+                for user in range(10):
+                    handler.handle(make_record('vote', question=1, choice=1, user=user))
+                handler.flush()
+                os.rename(path, path + '.old')
+                handler.handle(make_record('vote', question=1, choice=1, user=10))
+                handler.flush()
+                with open(path + '.old') as file:
+                    self.assertEqual(10, len(file.readlines()))
+                with open(path) as file:
+                    self.assertEqual(10, json.loads(file.read())['user'])
+            finally:
+                handler.close()
+
+    def test_restart_after_fork(self):
+        """A forked child writes through a listener thread of its own."""
+        handler = AsyncRotatingFileHandler()
+        try:
+            parent = handler.listener
+            handler._restart()
+            self.assertIsNot(parent, handler.listener)
+            self.assertIs(handler.queue, handler.listener.queue)
+            handler.flush()
+        finally:
+            parent.stop()
+            handler.close()
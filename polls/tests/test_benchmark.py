@@ -0,0 +1,61 @@
+"""Test the synthetic data generator and the benchmark command."""
+import io
+import json
+import os
+import tempfile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import override_settings
+from polls.benchmark import SCENARIOS, SyntheticData
+from polls.models import Choice, Question, Vote
+
+
+class SyntheticDataTests(TestCase):
+    """Test for generated polls."""
+
+    def test_generate(self):
+        """Generated counters match the generated votes and each user votes once per question."""
+        data = SyntheticData(questions=20, choices=3, users=15, votes=5, seed=1)
+        data.generate(batch_size=7)
+        self.assertEqual(20, Question.objects.count())
+        self.assertEqual(60, Choice.objects.count())
+        self.assertEqual(75, Vote.objects.count())
+        self.assertEqual(75, Choice.objects.aggregate(total=Sum('vote_count'))['total'])
+        for choice in Choice.objects.all():
+            self.assertEqual(Vote.objects.filter(choice=choice).count(), choice.vote_count)
+        self.assertEqual(18, len(data.open_question_ids()))
+
+    def test_seed(self):
+        """The same seed picks the same choices."""
+        picks = list(SyntheticData(10, 4, 5, 3, seed=2).picks())
+        self.assertEqual(picks, list(SyntheticData(10, 4, 5, 3, seed=2).picks()))
+
+    def test_too_many_votes(self):
+        """A user cannot vote on more questions than there are."""
+        with self.assertRaises(ValueError):
+            SyntheticData(questions=2, choices=2, users=1, votes=3)
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test for the benchmark command."""
+
+    def setUp(self):
+        """Clear cached pages."""
+        cache.clear()
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_report(self):
+        """Every scenario is timed without errors and the data is rolled back."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('benchmark', questions=30, users=10, votes=5, repeat=3, output=path, stdout=io.StringIO())
+            with open(path) as file:
+                report = json.load(file)
+        self.assertEqual(set(SCENARIOS), set(report['scenarios']))
+        for result in report['scenarios'].values():
+            self.assertEqual(3, result['requests'])
+            self.assertEqual(0, result['errors'])
+            self.assertGreater(result['queries_per_request'], 0)
+        self.assertFalse(Question.objects.exists())
@@ -0,0 +1,43 @@
+"""Test recording votes from many threads at once."""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TransactionTestCase
+from polls.models import Choice, Vote
+from polls.voting import record_vote
+from .test_questions import create_question
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    """Stress test for record_vote."""
+
+    votes_per_user = 100
+
+    def setUp(self):
+        """Create a question with three choices and two voters."""
+        self.question = create_question(question_text="Question1", days=0)
+        self.choices = [Choice.objects.create(choice_text=str(i), question=self.question) for i in range(3)]
+        self.users = [User.objects.create_user(username=f"voter{i}") for i in range(2)]
+
+    def vote(self, user):
+        """Record a vote for a random choice from a worker thread."""
+        try:
+            record_vote(user, random.choice(self.choices))
+        finally:
+            connection.close()
+
+    def test_concurrent_votes(self):
+        """Concurrent votes leave exactly one row per user and counters matching the rows."""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Needs a file database so threads share it.")
+        jobs = [user for user in self.users for _ in range(self.votes_per_user)]
+        random.shuffle(jobs)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(self.vote, jobs))
+        rows = Vote.objects.values('user').annotate(total=Count('pk'))
+        self.assertEqual({user.pk: 1 for user in self.users}, {row['user']: row['total'] for row in rows})
+        self.assertEqual(len(self.users), Choice.objects.aggregate(total=Sum('vote_count'))['total'])
+        for choice in Choice.objects.all():
+            self.assertEqual(Vote.objects.filter(choice=choice).count(), choice.vote_count)
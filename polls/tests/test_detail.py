@@ -0,0 +1,51 @@
+"""Test that the details page loads in a fixed number of queries."""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from polls.models import Choice, Vote
+from .test_questions import create_question
+
+
+class DetailQueryCountTests(TestCase):
+    """Test for queries made by the details page."""
+
+    def setUp(self):
+        """Create a user."""
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+
+    def create_poll(self, size):
+        """Create an open question with ``size`` choices."""
+        question = create_question(question_text=f"Question {size}", days=-1)
+        Choice.objects.bulk_create(Choice(choice_text=str(i), question=question) for i in range(size))
+        return question
+
+    def test_anonymous_query_budget(self):
+        """Anonymous visitors cost one query for the question and one for its choices."""
+        for size in (2, 20, 200):
+            question = self.create_poll(size)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('polls:detail', args=[question.id]))
+            self.assertEqual(size, len(response.context['choices']))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_authenticated_query_budget(self):
+        """Logged in users add the session and their vote, whatever the number of choices.
+
+        The user comes from the per-process user cache (see mysite/usercache.py).
+        """
+        self.client.force_login(self.user)
+        for size in (2, 20, 200):
+            question = self.create_poll(size)
+            choice = question.choice_set.last()
+            Vote.objects.create(choice=choice, user=self.user)
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('polls:detail', args=[question.id]))
+            self.assertEqual(choice, response.context['voted'])
+            self.assertContains(response, f'value="{choice.id}" checked')
+
+    def test_no_choices(self):
+        """Poll without choices shows a message instead of the vote button."""
+        question = self.create_poll(0)
+        response = self.client.get(reverse('polls:detail', args=[question.id]))
+        self.assertContains(response, "No choice created for this poll")
@@ -0,0 +1,72 @@
+"""Test staff CSV downloads of votes and results."""
+import csv
+import gzip
+import io
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from polls.models import Choice
+from polls.voting import record_vote
+from .test_questions import create_question
+
+
+class ExportTests(TestCase):
+    """Test for the votes and results downloads."""
+
+    def setUp(self):
+        """Create a question with votes and log in as staff."""
+        self.question = create_question(question_text="Question", days=-1)
+        self.choices = [Choice.objects.create(question=self.question, choice_text=text) for text in ("A", "B, C")]
+        for i in range(5):
+            user = User.objects.create_user(username=f"voter{i}", password="HelloIamhere!")
+            record_vote(user, self.choices[i % 2])
+        other = create_question(question_text="Other", days=-2)
+        Choice.objects.create(question=other, choice_text="D")
+        User.objects.create_user(username="admin", password="HelloIamhere!", is_staff=True)
+        self.client.login(username="admin", password="HelloIamhere!")
+
+    def read(self, response):
+        """Parse a streamed CSV download."""
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_votes(self):
+        """Every vote is one row, read in a single query whatever the number of votes."""
+        # the session and the votes; the staff user comes from the user cache
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:export_votes'))
+            rows = self.read(response)
+        self.assertEqual('attachment; filename="votes.csv"', response['Content-Disposition'])
+        self.assertEqual(['vote', 'question', 'question_text', 'choice', 'choice_text', 'user', 'username'], rows[0])
+        self.assertEqual(5, len(rows) - 1)
+        self.assertEqual(["Question", "B, C", "voter1"], [rows[2][2], rows[2][4], rows[2][6]])
+
+    def test_results(self):
+        """Results have one row per choice with its vote count, and can be narrowed to a question."""
+        rows = self.read(self.client.get(reverse('polls:export_results')))
+        self.assertEqual([["A", "3"], ["B, C", "2"], ["D", "0"]], [row[3:] for row in rows[1:]])
+        rows = self.read(self.client.get(reverse('polls:export_results'), {'question': self.question.id}))
+        self.assertEqual(3, len(rows))
+
+    def test_gzip(self):
+        """``?gzip=1`` streams the same CSV compressed."""
+        response = self.client.get(reverse('polls:export_votes'), {'gzip': 1})
+        self.assertEqual('application/gzip', response['Content-Type'])
+        self.assertEqual('attachment; filename="votes.csv.gz"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join(response.streaming_content)).decode())))
+        self.assertEqual(6, len(rows))
+
+    def test_staff_only(self):
+        """Visitors who are not staff are sent to the admin login."""
+        self.client.logout()
+        self.client.login(username="voter0", password="HelloIamhere!")
+        self.assertEqual(302, self.client.get(reverse('polls:export_votes')).status_code)
+        self.assertEqual(302, self.client.get(reverse('polls:export_results')).status_code)
+
+    async def test_refused_under_asgi(self):
+        """Downloads are not served by the ASGI handler, which would read the rows on the event loop."""
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse('polls:export_votes'))
+        self.assertEqual(501, response.status_code)
+        self.assertContains(response, "export_polls", status_code=501)
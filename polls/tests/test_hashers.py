@@ -0,0 +1,56 @@
+"""Tests of the password hashers and the signup hashing path."""
+from unittest import mock
+import django.test
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+from django.urls import reverse
+
+SCRYPT = ['mysite.hashers.ScryptPasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=SCRYPT, PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10)
+class ScryptPasswordHasherTest(django.test.SimpleTestCase):
+    """Testing for the scrypt hasher."""
+
+    def test_round_trip(self):
+        """Encoded passwords verify and use Django 4.0's format."""
+        encoded = make_password("Iamhere1234", salt="seasalt")
+        algorithm, work_factor, salt, block_size, parallelism, _ = encoded.split('$')
+        self.assertEqual(('scrypt', '1024', 'seasalt', '8', '1'), (algorithm, work_factor, salt, block_size,
+                                                                   parallelism))
+        self.assertTrue(check_password("Iamhere1234", encoded))
+        self.assertFalse(check_password("Iamhere12345", encoded))
+
+    def test_must_update_on_new_work_factor(self):
+        """Hashes are upgraded when the work factor changes."""
+        encoded = make_password("Iamhere1234")
+        self.assertFalse(identify_hasher(encoded).must_update(encoded))
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 11):
+            self.assertTrue(identify_hasher(encoded).must_update(encoded))
+            # the old work factor still verifies
+            self.assertTrue(check_password("Iamhere1234", encoded))
+
+    def test_pbkdf2_hash_still_verifies(self):
+        """Hashes made before the switch still verify, and are rehashed with scrypt."""
+        encoded = hashers.PBKDF2PasswordHasher().encode("Iamhere1234", "seasalt", iterations=1000)
+        setter = mock.Mock()
+        self.assertTrue(check_password("Iamhere1234", encoded, setter))
+        setter.assert_called_once_with("Iamhere1234")
+
+
+class SignupHashingTest(django.test.TestCase):
+    """Testing that signup hashes the password once."""
+
+    def test_signup_hashes_once(self):
+        """Signup logs the new user in without checking the password again."""
+        form_data = {'username': "Mark", 'password1': "Iamhere1234", 'password2': "Iamhere1234"}
+        with mock.patch('django.contrib.auth.base_user.make_password', wraps=make_password) as made, \
+                mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as checked:
+            response = self.client.post(reverse("signup"), form_data)
+        self.assertRedirects(response, reverse("polls:index"))
+        self.assertEqual(1, made.call_count)
+        checked.assert_not_called()
+        user = User.objects.get(username="Mark")
+        self.assertEqual(user.pk, int(self.client.session['_auth_user_id']))
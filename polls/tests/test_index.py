@@ -1,12 +1,20 @@
 """Test index view of polls app."""
-from django.test import TestCase
+import datetime
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from polls.models import Question
 from .test_questions import create_question
 
 
 class QuestionIndexViewTests(TestCase):
     """Test for Question queries."""
 
+    def setUp(self):
+        """Start from an empty index cache."""
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -32,3 +40,66 @@ class QuestionIndexViewTests(TestCase):
             response.context['latest_question'],
             [question2, question1],
         )
+
+    def test_active_before_ended(self):
+        """Active polls are listed before ended polls regardless of publish date."""
+        ended = create_question(question_text="Ended question.", days=-2, end_day=-1)
+        active = create_question(question_text="Active question.", days=-30)
+        response = self.client.get(reverse('polls:index'))
+        self.assertQuerysetEqual(response.context['latest_question'], [active, ended])
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_keyset_pagination(self):
+        """The next page continues after the last question of the previous page."""
+        questions = [create_question(question_text=f"Question {i}.", days=-i) for i in range(1, 6)]
+        response = self.client.get(reverse('polls:index'))
+        page = response.context['latest_question']
+        self.assertQuerysetEqual(page, questions[:2])
+        self.assertTrue(page.has_next)
+        response = self.client.get(reverse('polls:index'), {'after': page.next_cursor})
+        page = response.context['latest_question']
+        self.assertQuerysetEqual(page, questions[2:4])
+        response = self.client.get(reverse('polls:index'), {'after': page.next_cursor})
+        page = response.context['latest_question']
+        self.assertQuerysetEqual(page, questions[4:])
+        self.assertFalse(page.has_next)
+
+    def test_invalid_cursor(self):
+        """An invalid cursor shows the first page."""
+        question = create_question(question_text="Past question.", days=-30)
+        for cursor in ('not-a-cursor', '1.0.99999999999999999999999', '1.99999999999999999999999.1'):
+            response = self.client.get(reverse('polls:index'), {'after': cursor})
+            self.assertQuerysetEqual(response.context['latest_question'], [question])
+
+
+class IndexCacheTests(TestCase):
+    """Test for the cached question list."""
+
+    def setUp(self):
+        """Start from an empty index cache."""
+        cache.clear()
+
+    def test_cache_hit_without_queries(self):
+        """A second visit renders the list from cache without any query."""
+        create_question(question_text="Past question.", days=-30)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Past question.")
+
+    def test_question_save_invalidates(self):
+        """Saving a question discards the cached list."""
+        question = create_question(question_text="Past question.", days=-30)
+        self.client.get(reverse('polls:index'))
+        question.question_text = "Edited question."
+        question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), "Edited question.")
+
+    def test_expires_at_next_boundary(self):
+        """The list is not cached past the next publish date."""
+        create_question(question_text="Past question.", days=-30)
+        Question.objects.create(question_text="Soon question.",
+                                pub_date=timezone.now() + datetime.timedelta(seconds=30))
+        response = self.client.get(reverse('polls:index'))
+        self.assertLessEqual(response.context['index_timeout'], 30)
+        self.assertNotContains(response, "Soon question.")
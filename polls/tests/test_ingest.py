@@ -0,0 +1,150 @@
+"""Test for buffered (write-behind) vote ingestion."""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from polls import ingest
+from polls.checks import check_vote_ingestion
+from polls.ingest import FileVoteBuffer, flush, flush_votes, get_buffer, get_last_flush
+from polls.models import Choice, Vote
+from .test_questions import create_question
+
+
+@override_settings(POLLS_VOTE_INGESTION='memory', POLLS_VOTE_FLUSH_INTERVAL=0)
+class BufferedVoteTests(TestCase):
+    """Test votes queued in memory and flushed in batches."""
+
+    def setUp(self):
+        """Create a question, choices and a logged in user."""
+        cache.clear()
+        get_buffer().drain(10 ** 6)
+        self.atexit = mock.patch('polls.ingest.atexit').start()
+        self.addCleanup(mock.patch.stopall)
+        self.question = create_question(question_text="Question1", days=0)
+        self.choice1 = Choice.objects.create(choice_text="1", question=self.question)
+        self.choice2 = Choice.objects.create(choice_text="2", question=self.question)
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.force_login(self.user)
+
+    def vote(self, choice):
+        """Submit a vote through the view."""
+        return self.client.post(reverse('polls:vote', kwargs={'question_id': self.question.id}),
+                                {'choice': choice.id})
+
+    def test_vote_is_queued(self):
+        """The view redirects without recording the vote until the buffer is flushed."""
+        response = self.vote(self.choice1)
+        self.assertEqual(302, response.status_code)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(1, flush())
+        self.assertEqual(1, Choice.objects.get(pk=self.choice1.pk).vote_count)
+        self.assertIsNotNone(get_last_flush(self.question.id))
+
+    def test_flush_at_exit(self):
+        """Votes still in memory are recorded when the process exits."""
+        self.vote(self.choice1)
+        self.atexit.register.assert_called_with(ingest._flush_at_exit)
+        ingest._flush_at_exit()
+        self.assertEqual(1, Choice.objects.get(pk=self.choice1.pk).vote_count)
+
+    def test_check_flush_interval(self):
+        """The memory buffer without a flush thread is reported by a system check."""
+        self.assertEqual(['polls.E001'], [error.id for error in check_vote_ingestion(None)])
+        with override_settings(POLLS_VOTE_FLUSH_INTERVAL=1.0):
+            self.assertEqual([], check_vote_ingestion(None))
+        with override_settings(POLLS_VOTE_INGESTION='file'):
+            self.assertEqual([], check_vote_ingestion(None))
+
+    def test_last_vote_wins(self):
+        """Several votes by one user in a batch end up as their last choice."""
+        self.vote(self.choice1)
+        self.vote(self.choice2)
+        flush()
+        self.assertEqual(self.choice2.id, Vote.objects.get(user=self.user).choice_id)
+        self.assertEqual(0, Choice.objects.get(pk=self.choice1.pk).vote_count)
+        self.assertEqual(1, Choice.objects.get(pk=self.choice2.pk).vote_count)
+
+    def test_flush_moves_existing_vote(self):
+        """A flushed vote replaces the vote recorded earlier and moves the count."""
+        self.vote(self.choice1)
+        flush()
+        self.vote(self.choice2)
+        flush()
+        self.assertEqual(1, Vote.objects.count())
+        self.assertEqual(0, Choice.objects.get(pk=self.choice1.pk).vote_count)
+        self.assertEqual(1, Choice.objects.get(pk=self.choice2.pk).vote_count)
+
+    def test_batch_of_many_users(self):
+        """A batch creates all votes and counts them with a fixed number of queries."""
+        users = User.objects.bulk_create(User(username=f"user{i}") for i in range(50))
+        users = User.objects.filter(username__startswith="user")
+        entries = [{'user': user.pk, 'question': self.question.pk, 'choice': self.choice1.pk} for user in users]
+        with self.assertNumQueries(5):
+            flush_votes(entries)
+        self.assertEqual(50, Choice.objects.get(pk=self.choice1.pk).vote_count)
+
+    def test_results_show_last_flush(self):
+        """Results page says when votes were last counted."""
+        response = self.client.get(reverse('polls:results', kwargs={'pk': self.question.id}))
+        self.assertContains(response, "Recent votes are still being counted.")
+        self.vote(self.choice1)
+        flush()
+        response = self.client.get(reverse('polls:results', kwargs={'pk': self.question.id}))
+        self.assertContains(response, "Votes counted up to")
+
+
+class FileVoteBufferTests(TestCase):
+    """Test votes queued in a spool file."""
+
+    def setUp(self):
+        """Create a spool path in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'spool.jsonl')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+
+    def test_append_and_drain(self):
+        """Entries come back in order and the spool file is consumed."""
+        buffer = FileVoteBuffer(self.path)
+        for i in range(3):
+            buffer.append({'user': i, 'question': 1, 'choice': 1})
+        self.assertEqual([0, 1], [entry['user'] for entry in buffer.drain(2)])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual([2], [entry['user'] for entry in buffer.drain(2)])
+        self.assertEqual([], buffer.drain(2))
+
+    def test_flush_command(self):
+        """flush_votes records the votes written to the spool file."""
+        question = create_question(question_text="Question1", days=0)
+        choice = Choice.objects.create(choice_text="1", question=question)
+        user = User.objects.create_user(username="voter")
+        with override_settings(POLLS_VOTE_INGESTION='file', POLLS_VOTE_SPOOL=self.path):
+            FileVoteBuffer(self.path).append({'user': user.pk, 'question': question.pk, 'choice': choice.pk})
+            call_command('flush_votes', stdout=StringIO())
+        self.assertEqual(1, Choice.objects.get(pk=choice.pk).vote_count)
+
+
+class FlushFailureTests(TransactionTestCase):
+    """Test a flush whose batch holds a vote that can no longer be recorded, with foreign keys checked on commit."""
+
+    def test_bad_vote_dropped_alone(self):
+        """Only the vote for a deleted choice is lost, and the question's results are still refreshed."""
+        cache.clear()
+        question = create_question(question_text="Question1", days=0)
+        choice, gone = (Choice.objects.create(choice_text=text, question=question) for text in ("1", "2"))
+        users = [User.objects.create_user(username=f"voter{i}") for i in range(3)]
+        entries = [{'user': user.pk, 'question': question.pk, 'choice': choice.pk} for user in users[:2]]
+        entries.append({'user': users[2].pk, 'question': question.pk, 'choice': gone.pk})
+        gone.delete()
+        with self.assertLogs('polls', 'ERROR'):
+            flush_votes(entries)
+        self.assertEqual(2, Vote.objects.count())
+        self.assertEqual(2, Choice.objects.get(pk=choice.pk).vote_count)
+        self.assertIsNotNone(get_last_flush(question.pk))
@@ -0,0 +1,79 @@
+"""Test the per-view request metrics middleware and its staff page."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from mysite.middleware import MetricsRegistry, percentile, registry
+from polls.models import Choice
+from .test_questions import create_question
+
+
+class MetricsRegistryTests(TestCase):
+    """Test for the rolling percentiles."""
+
+    def test_percentile(self):
+        """Nearest-rank percentiles of a sorted list."""
+        samples = list(range(1, 101))
+        self.assertEqual(50, percentile(samples, .50))
+        self.assertEqual(95, percentile(samples, .95))
+        self.assertEqual(99, percentile(samples, .99))
+        self.assertEqual(0.0, percentile([], .50))
+
+    def test_window(self):
+        """Only the latest ``window`` samples count, the request total keeps growing."""
+        metrics = MetricsRegistry(window=10)
+        for wall_ms in range(100):
+            metrics.record('view', {'wall_ms': wall_ms, 'db_queries': 1, 'db_ms': 0, 'render_ms': 0})
+        summary = metrics.summary()['view']
+        self.assertEqual(100, summary['requests'])
+        self.assertEqual(10, summary['window'])
+        self.assertEqual(94, summary['wall_ms']['p50'])
+        self.assertEqual(1, summary['db_queries']['p99'])
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    """Test for measurements taken by the middleware."""
+
+    def setUp(self):
+        """Start from empty metrics and cache."""
+        cache.clear()
+        registry.reset()
+        self.question = create_question(question_text="Question", days=-1)
+        Choice.objects.create(choice_text="Choice", question=self.question)
+
+    def test_records_view(self):
+        """A request adds a sample under its URL name with its query count."""
+        with self.assertLogs('mysite.metrics', 'INFO') as logs:
+            self.client.get(reverse('polls:detail', args=[self.question.id]))
+        summary = registry.summary()['polls:detail']
+        self.assertEqual(1, summary['requests'])
+        self.assertEqual(2, summary['db_queries']['p50'])
+        self.assertGreater(summary['render_ms']['p50'], 0)
+        self.assertGreaterEqual(summary['wall_ms']['p50'], summary['render_ms']['p50'])
+        self.assertIn('"view": "polls:detail"', logs.output[0])
+        self.assertEqual(2, logs.records[0].metrics['db_queries'])
+
+    def test_unresolved_not_recorded(self):
+        """Requests that match no URL are not recorded."""
+        self.client.get('/no-such-page/')
+        self.assertEqual({}, registry.summary())
+
+    def test_staff_only(self):
+        """Metrics page redirects visitors who are not staff to the admin login."""
+        User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.login(username="voter", password="HelloIamhere!")
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(302, response.status_code)
+
+    def test_staff_dump_and_reset(self):
+        """Staff see percentiles of every view and can reset them."""
+        User.objects.create_user(username="admin", password="HelloIamhere!", is_staff=True)
+        self.client.login(username="admin", password="HelloIamhere!")
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('metrics'), {'reset': 1})
+        self.assertIn('polls:index', registry.summary())
+        response = self.client.post(reverse('metrics'))
+        views = response.json()['views']
+        self.assertEqual(1, views['polls:index']['requests'])
+        self.assertEqual({'p50', 'p95', 'p99'}, set(views['polls:index']['wall_ms']))
+        self.assertNotIn('polls:index', registry.summary())
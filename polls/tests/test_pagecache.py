@@ -0,0 +1,98 @@
+"""Test the page cache of anonymous visitors."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.cache import LOCK_KEY
+from polls.models import Choice, Question
+from polls.pagination import encode_cursor
+from polls.views import save_vote
+from .test_questions import create_question
+
+
+# the page cache is off by default with the memory cache of the tests
+@override_settings(POLLS_PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTests(TestCase):
+    """Test that anonymous pages come from the cache until votes or edits change them."""
+
+    def setUp(self):
+        """Create a question with a choice and a voter, and start from an empty cache."""
+        cache.clear()
+        self.question = create_question(question_text="Cached question", days=-1)
+        self.choice = Choice.objects.create(question=self.question, choice_text="Yes")
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+
+    def assertCached(self, url):
+        """Assert that the second anonymous request is answered without templates or queries."""
+        first = self.client.get(url)
+        self.assertTrue(first.templates)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual([], second.templates)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_index_and_results_cached(self):
+        """Index, its later pages and results are cached for anonymous visitors."""
+        self.assertCached(reverse('polls:index'))
+        question = Question.objects.published().get(pk=self.question.pk)
+        self.assertCached(reverse('polls:index') + '?after=' + encode_cursor(question))
+        self.assertCached(reverse('polls:results', args=[self.question.id]))
+
+    def test_unread_parameters_not_cached(self):
+        """Query parameters a view does not read, and invalid cursors, do not add pages to the cache."""
+        for query in ('?utm_source=mail', '?after=bogus', '?after=1.2.3&after=4.5.6'):
+            self.client.get(reverse('polls:index') + query)
+            self.assertTrue(self.client.get(reverse('polls:index') + query).templates)
+        url = reverse('polls:results', args=[self.question.id])
+        self.client.get(url + '?page=2')
+        self.assertTrue(self.client.get(url + '?page=2').templates)
+
+    def test_vote_replaces_results(self):
+        """A vote changes the results page at once."""
+        url = reverse('polls:results', args=[self.question.id])
+        self.assertContains(self.client.get(url), "0 votes")
+        save_vote(self.user, self.question, self.choice)
+        self.assertContains(self.client.get(url), "1 vote ")
+
+    def test_edits_replace_pages(self):
+        """Saving a question or a choice, as the admin does, changes the pages showing it."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.question.question_text = "Edited question"
+        self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), "Edited question")
+        self.choice.choice_text = "Edited choice"
+        self.choice.save()
+        self.assertContains(self.client.get(reverse('polls:results', args=[self.question.id])), "Edited choice")
+
+    def test_logged_in_users_get_their_page(self):
+        """Logged in users never get the anonymous page, nor put theirs in the cache."""
+        self.client.get(reverse('polls:index'))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('polls:index')), "Hi, voter")
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('polls:index')), "Hi, voter")
+
+    def test_stale_results_not_cached(self):
+        """Results served while another request recomputes them are not cached."""
+        url = reverse('polls:results', args=[self.question.id])
+        self.client.get(url)
+        save_vote(self.user, self.question, self.choice)
+        # another request holds the recompute lock, so the old tally is served
+        cache.add(LOCK_KEY.format(self.question.id), True, 30)
+        with override_settings(POLLS_RESULTS_STALE_TIMEOUT=30):
+            self.assertContains(self.client.get(url), "0 votes")
+            cache.delete(LOCK_KEY.format(self.question.id))
+            self.assertContains(self.client.get(url), "1 vote ")
+
+    @override_settings(POLLS_PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        """A timeout of 0 renders every page."""
+        self.client.get(reverse('polls:index'))
+        self.assertTrue(self.client.get(reverse('polls:index')).templates)
+
+
+@override_settings(ROOT_URLCONF='polls.tests.urls_async')
+class AsyncPageCacheTests(AnonymousPageCacheTests):
+    """Test the page cache of the async views."""
@@ -1,6 +1,6 @@
 """Test with polls pub_date and end_date."""
 from django.test import TestCase
-from polls.models import Question
+from polls.models import Question, QuestionStatus
 from django.utils import timezone
 import datetime
 from django.urls import reverse
@@ -109,3 +109,28 @@ class QuestionResultViewTests(QuestionTests):
         """Test for viewing future poll, this shouldn’t be appeared."""
         response = self.client.get(reverse('polls:results', kwargs={'pk': self.future_question.id}))
         self.assertEqual(response.status_code, 404)
+
+
+class QuestionQuerySetTests(QuestionTests):
+    """Test status computed by QuestionQuerySet."""
+
+    def test_status_annotation(self):
+        """Every question gets the status matching its dates."""
+        statuses = dict(Question.objects.with_status().values_list('pk', 'status'))
+        self.assertEqual(QuestionStatus.OPEN, statuses[self.recent_question.pk])
+        self.assertEqual(QuestionStatus.CLOSED, statuses[self.ended_question.pk])
+        self.assertEqual(QuestionStatus.SCHEDULED, statuses[self.future_question.pk])
+
+    def test_status_filters(self):
+        """open(), closed(), scheduled() and published() select the right questions."""
+        self.assertQuerysetEqual(Question.objects.open(), [self.recent_question])
+        self.assertQuerysetEqual(Question.objects.closed(), [self.ended_question])
+        self.assertQuerysetEqual(Question.objects.scheduled(), [self.future_question])
+        self.assertEqual({self.recent_question, self.ended_question}, set(Question.objects.published()))
+
+    def test_annotated_can_vote_does_not_read_clock(self):
+        """Annotated questions use the status from the query, not the current time."""
+        question = Question.objects.with_status().get(pk=self.recent_question.pk)
+        question.pub_date = timezone.now() + datetime.timedelta(days=1)
+        self.assertTrue(question.can_vote())
+        self.assertTrue(question.is_published())
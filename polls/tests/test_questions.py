@@ -1,4 +1,5 @@
 """Module used to test polls models."""
+from django.core.cache import cache
 from django.test import TestCase
 from polls.models import Question, Choice
 from django.utils import timezone
@@ -23,6 +24,7 @@ class QuestionTests(TestCase):
 
     def setUp(self):
         """Initialize all necessary questions."""
+        cache.clear()
         self.recent_question = create_question(question_text="Question1", days=0)
         self.ended_question = create_question(question_text="Question2", days=-10, end_day=-5)
         self.future_question = create_question(question_text="Question3", days=10)
@@ -0,0 +1,104 @@
+"""Tests of the login rate limiter."""
+import time
+from unittest import mock
+import django.test
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from mysite import ratelimit
+from mysite.ratelimit import failed_attempts, get_ip_address, record_failure
+
+
+@override_settings(LOGIN_RATE_LIMIT_IP=5, LOGIN_RATE_LIMIT_USERNAME=3, LOGIN_RATE_LIMIT_WINDOW=60,
+                   LOGIN_RATE_LIMIT_CACHE='login_rate_limit', TRUSTED_PROXY_DEPTH=0)
+class LoginRateLimitTest(django.test.TestCase):
+    """Testing for the login rate limit."""
+
+    def setUp(self):
+        """Create a user and start with empty counters."""
+        super().setUp()
+        caches['login_rate_limit'].clear()
+        ratelimit._local_cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="HelloIamhere!")
+
+    def login(self, username="testuser", password="wrong", ip="10.0.0.1"):
+        """Post the login form from ``ip``."""
+        return self.client.post(reverse("login"), {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_username_limit(self):
+        """After too many failures even the right password is refused, without hashing it."""
+        for _ in range(3):
+            self.assertContains(self.login(), "Please enter a correct username and password")
+        with mock.patch.object(ModelBackend, 'authenticate') as backend, self.assertNumQueries(0):
+            response = self.login(password="HelloIamhere!", ip="10.0.0.2")
+        backend.assert_not_called()
+        self.assertContains(response, "Too many failed login attempts")
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_ip_limit(self):
+        """One client trying many usernames is refused."""
+        for i in range(5):
+            self.login(username=f"user{i}")
+        self.assertContains(self.login(password="HelloIamhere!"), "Too many failed login attempts")
+        response = self.login(password="HelloIamhere!", ip="10.0.0.2")
+        self.assertRedirects(response, reverse("polls:index"))
+
+    def test_own_cache(self):
+        """Counters are kept apart from the default cache, so clearing or culling it keeps them."""
+        for _ in range(3):
+            self.login()
+        cache.clear()
+        self.assertContains(self.login(password="HelloIamhere!"), "Too many failed login attempts")
+
+    def test_login_resets_username(self):
+        """A successful login forgets the failures of the username."""
+        self.login()
+        self.login()
+        self.assertRedirects(self.login(password="HelloIamhere!"), reverse("polls:index"))
+        self.client.logout()
+        self.login()
+        self.login()
+        self.assertRedirects(self.login(password="HelloIamhere!"), reverse("polls:index"))
+
+    def test_sliding_window(self):
+        """Failures of the previous bucket count for the part of it still in the window."""
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        now = time.time()
+        for _ in range(4):
+            record_failure(request, None)
+        bucket_start = now - now % 60
+        scope, key, _ = ratelimit._identities(request, None)[0]
+        self.assertEqual(4, failed_attempts(scope, key, now=bucket_start + 59))
+        self.assertEqual(2, failed_attempts(scope, key, now=bucket_start + 90))
+        self.assertEqual(0, failed_attempts(scope, key, now=bucket_start + 120))
+
+    @override_settings(LOGIN_RATE_LIMIT_CACHE='shared')
+    def test_local_stand_in(self):
+        """Attempts are counted in the process when the configured cache is missing."""
+        for _ in range(3):
+            self.login()
+        self.assertContains(self.login(password="HelloIamhere!"), "Too many failed login attempts")
+
+
+class GetIpAddressTest(django.test.SimpleTestCase):
+    """Testing for the client IP address behind proxies."""
+
+    def ip(self, depth, forwarded_for=None):
+        """Get the IP address of a request from 10.0.0.9 with ``depth`` trusted proxies."""
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        with override_settings(TRUSTED_PROXY_DEPTH=depth):
+            return get_ip_address(RequestFactory().get("/", REMOTE_ADDR="10.0.0.9", **extra))
+
+    def test_no_proxy(self):
+        """Without trusted proxies a forged header is ignored."""
+        self.assertEqual("10.0.0.9", self.ip(0, "1.2.3.4"))
+        self.assertEqual("10.0.0.9", self.ip(1))
+
+    def test_trusted_proxies(self):
+        """The client is read as many entries from the right as there are trusted proxies."""
+        self.assertEqual("5.6.7.8", self.ip(1, "1.2.3.4, 5.6.7.8"))
+        self.assertEqual("1.2.3.4", self.ip(2, "1.2.3.4, 5.6.7.8"))
+        self.assertEqual("1.2.3.4", self.ip(3, "1.2.3.4, 5.6.7.8"))
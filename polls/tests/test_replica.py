@@ -0,0 +1,95 @@
+"""Test read-replica routing with two SQLite files standing in for primary and replica."""
+import math
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from mysite.db import STICKY_COOKIE, PrimaryReplicaRouter, check_connections, route_reads
+from polls.models import Choice, Question
+from .test_questions import create_question
+
+
+@override_settings(DATABASE_READ_REPLICA=True)
+class ReplicaRoutingTests(TestCase):
+    """Test for reads sent to the replica and read-your-writes stickiness."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """Create a poll on the primary only, as if the replica had not caught up."""
+        cache.clear()
+        self.question = create_question(question_text="Fresh poll", days=-1)
+        Choice.objects.create(question=self.question, choice_text="Yes")
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+
+    def test_router(self):
+        """Reads use the replica until the request is pinned or writes."""
+        router = PrimaryReplicaRouter()
+        with route_reads(use_primary=False):
+            self.assertEqual('replica', router.db_for_read(Question))
+            self.assertEqual('default', router.db_for_write(Question))
+            self.assertEqual('default', router.db_for_read(Question))
+        with route_reads(use_primary=True):
+            self.assertEqual('default', router.db_for_read(Question))
+
+    @override_settings(DATABASE_READ_REPLICA=False)
+    def test_disabled(self):
+        """Without DATABASE_READ_REPLICA every read uses the primary."""
+        with route_reads(use_primary=False):
+            self.assertEqual('default', PrimaryReplicaRouter().db_for_read(Question))
+
+    def test_get_reads_replica(self):
+        """Pages read the replica, which does not have the new poll yet."""
+        self.assertEqual(404, self.client.get(reverse('polls:detail', args=[self.question.id])).status_code)
+        Question.objects.using('replica').create(pk=self.question.pk, question_text="Fresh poll",
+                                                 pub_date=self.question.pub_date)
+        self.assertEqual(200, self.client.get(reverse('polls:detail', args=[self.question.id])).status_code)
+
+    def test_sticky_after_write(self):
+        """After logging in (a write) the client reads the primary, and sees its session and the new poll."""
+        response = self.client.post(reverse('login'), {'username': "voter", 'password': "HelloIamhere!"})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.context['user'].is_authenticated)
+        del self.client.cookies[STICKY_COOKIE]
+        self.assertEqual(404, self.client.get(reverse('polls:detail', args=[self.question.id])).status_code)
+
+
+class HealthCheckTests(SimpleTestCase):
+    """Test for closing broken persistent connections."""
+
+    databases = {'default'}
+
+    def connection(self, max_age, usable, checked_at=-math.inf):
+        """Build an open connection double, which last worked at ``checked_at``."""
+        return mock.Mock(connection=object(), settings_dict={'CONN_MAX_AGE': max_age}, in_atomic_block=False,
+                         health_checked_at=checked_at, **{'is_usable.return_value': usable})
+
+    def test_close_broken(self):
+        """Only broken persistent connections are closed."""
+        broken, working, short = self.connection(60, False), self.connection(60, True), self.connection(0, False)
+        with mock.patch('mysite.db.connections') as connections:
+            connections.all.return_value = [broken, working, short]
+            check_connections()
+        broken.close.assert_called_once()
+        working.close.assert_not_called()
+        short.is_usable.assert_not_called()
+
+    def test_skip_recently_used(self):
+        """Connections that ran a query within the idle time are not checked again."""
+        recent = self.connection(60, False, checked_at=time.monotonic())
+        with mock.patch('mysite.db.connections') as connections, override_settings(DATABASE_HEALTH_CHECK_IDLE=30):
+            connections.all.return_value = [recent]
+            check_connections()
+        recent.is_usable.assert_not_called()
+        recent.close.assert_not_called()
+
+    def test_queries_count_as_checks(self):
+        """Each query notes that its connection worked."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertAlmostEqual(time.monotonic(), connection.health_checked_at, delta=5)
@@ -0,0 +1,122 @@
+"""Tests of cached sessions, the user cache and session cleanup."""
+import datetime
+import io
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mysite.usercache import user_cache
+from polls.models import Choice
+from .test_questions import create_question
+
+DJANGO_MIDDLEWARE = [name.replace('mysite.middleware.CachedAuthenticationMiddleware',
+                                  'django.contrib.auth.middleware.AuthenticationMiddleware')
+                     for name in settings.MIDDLEWARE]
+DB_SESSIONS = {'SESSION_ENGINE': 'django.contrib.sessions.backends.db', 'MIDDLEWARE': DJANGO_MIDDLEWARE}
+CACHED_SESSIONS = {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'}
+
+
+class CachedSessionQueryTests(TestCase):
+    """Test that authenticated poll views read neither django_session nor auth_user."""
+
+    def setUp(self):
+        """Create a user and an open poll."""
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.question = create_question(question_text="Session?", days=-1)
+        self.choices = [Choice.objects.create(question=self.question, choice_text=str(i)) for i in range(2)]
+
+    def queries(self, overrides, request):
+        """Log in with ``overrides`` and get the SQL of ``request(client)`` once session and user are cached."""
+        with override_settings(**overrides):
+            # a new client, as a client keeps the middleware it loaded first
+            client = Client()
+            client.force_login(self.user)
+            request(client)
+            with CaptureQueriesContext(connection) as context:
+                request(client)
+        return [query['sql'] for query in context.captured_queries]
+
+    def assertDropsSessionAndUser(self, request):
+        """Assert that cached sessions and users save exactly the two queries of Django's defaults."""
+        before = self.queries(DB_SESSIONS, request)
+        after = self.queries(CACHED_SESSIONS, request)
+        self.assertEqual(len(before) - 2, len(after))
+        self.assertTrue(any('django_session' in sql for sql in before))
+        self.assertTrue(any('auth_user' in sql for sql in before))
+        self.assertFalse(any('django_session' in sql or 'auth_user' in sql for sql in after))
+
+    def test_detail(self):
+        """Detail page drops the session and user queries."""
+        self.assertDropsSessionAndUser(lambda client: client.get(reverse('polls:detail', args=[self.question.id])))
+
+    def test_results(self):
+        """Results page drops the session and user queries."""
+        self.assertDropsSessionAndUser(lambda client: client.get(reverse('polls:results', args=[self.question.id])))
+
+    def test_async_detail(self):
+        """Async detail page reads the user from the cache too."""
+        url = reverse('polls:detail', args=[self.question.id])
+        overrides = dict(CACHED_SESSIONS, ROOT_URLCONF='polls.tests.urls_async')
+        sql = self.queries(overrides, lambda client: client.get(url))
+        self.assertFalse(any('django_session' in query or 'auth_user' in query for query in sql))
+
+    def test_vote(self):
+        """Vote drops the session and user queries."""
+        url = reverse('polls:vote', args=[self.question.id])
+        self.assertDropsSessionAndUser(lambda client: client.post(url, {'choice': self.choices[0].id}))
+
+
+@override_settings(**CACHED_SESSIONS)
+class UserCacheTests(TestCase):
+    """Test that cached users never outlive their session or their password."""
+
+    def setUp(self):
+        """Create and log in a user."""
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.force_login(self.user)
+        self.question = create_question(question_text="Cached?", days=-1)
+        self.url = reverse('polls:vote', args=[self.question.id])
+
+    def test_logout(self):
+        """A logged out session is anonymous although its user is cached."""
+        self.client.get(self.url)
+        self.assertIsNotNone(user_cache.get(self.user.pk))
+        self.client.logout()
+        self.assertRedirects(self.client.post(self.url), f"/accounts/login/?next={self.url}",
+                             fetch_redirect_response=False)
+
+    def test_password_change(self):
+        """Changing the password drops the cached user and ends its other sessions."""
+        self.client.get(self.url)
+        self.user.set_password("NewPassword!23")
+        self.user.save()
+        self.assertIsNone(user_cache.get(self.user.pk))
+        self.assertRedirects(self.client.post(self.url), f"/accounts/login/?next={self.url}",
+                             fetch_redirect_response=False)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        """With no timeout, users are not cached."""
+        user_cache.delete(self.user.pk)
+        self.client.get(self.url)
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+
+class PurgeSessionsTests(TestCase):
+    """Test for the purge_sessions command."""
+
+    def test_deletes_expired_in_batches(self):
+        """Only expired sessions are deleted, a batch at a time."""
+        for days in (-3, -2, -1, 1):
+            Session.objects.create(session_key=SessionStore()._get_new_session_key(), session_data='',
+                                   expire_date=timezone.now() + datetime.timedelta(days=days))
+        with CaptureQueriesContext(connection) as context:
+            call_command('purge_sessions', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(1, Session.objects.count())
+        self.assertEqual(2, sum(sql['sql'].startswith('DELETE') for sql in context.captured_queries))
@@ -0,0 +1,92 @@
+"""Test sharded vote counters."""
+import io
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Choice, CounterShard
+from polls.tally import get_tally
+from polls.voting import record_vote
+from .test_questions import create_question
+
+
+class ShardedCounterTests(TestCase):
+    """Test for votes counted in counter shards."""
+
+    def setUp(self):
+        """Create a question with four counter shards, two choices and twenty voters."""
+        self.question = create_question(question_text="Hot poll", days=-1)
+        self.question.counter_shards = 4
+        self.question.save()
+        self.yes = Choice.objects.create(question=self.question, choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question, choice_text="No")
+        self.users = [User.objects.create_user(username=f"voter{i}") for i in range(20)]
+        for user in self.users:
+            record_vote(user, self.question.choice_set.get(pk=self.yes.pk))
+
+    def test_votes_go_to_shards(self):
+        """Votes land in up to four shard rows instead of the choice counter."""
+        self.yes.refresh_from_db()
+        self.assertEqual(0, self.yes.vote_count)
+        self.assertLessEqual(self.yes.shards.count(), 4)
+        self.assertEqual(20, self.yes.shards.aggregate(total=Sum('count'))['total'])
+        self.assertEqual(20, self.yes.votes)
+
+    def test_tally_sums_shards(self):
+        """Tally and results page add the shards up, moved votes included."""
+        for user in self.users[:5]:
+            record_vote(user, self.question.choice_set.get(pk=self.no.pk))
+        tally = get_tally(self.question)
+        self.assertEqual([15, 5], tally.counts)
+        self.assertEqual(20, tally.total)
+        response = self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertEqual([15, 5], response.context['data'])
+
+    def test_consolidate(self):
+        """Consolidation moves shard counts into the choice counter and keeps the totals."""
+        for user in self.users[:5]:
+            record_vote(user, self.question.choice_set.get(pk=self.no.pk))
+        out = io.StringIO()
+        call_command('consolidate_vote_shards', stdout=out)
+        self.assertIn("into 2 choice(s)", out.getvalue())
+        self.assertFalse(CounterShard.objects.exists())
+        self.assertEqual([15, 5], list(Choice.objects.order_by('pk').values_list('vote_count', flat=True)))
+        self.assertEqual([15, 5], get_tally(self.question).counts)
+        call_command('consolidate_vote_shards', stdout=out)
+        self.assertIn("No counter shards to consolidate.", out.getvalue())
+
+    def test_consolidate_question(self):
+        """``--question`` only consolidates the given questions."""
+        call_command('consolidate_vote_shards', question=[self.question.id + 1], stdout=io.StringIO())
+        self.assertTrue(CounterShard.objects.exists())
+        call_command('consolidate_vote_shards', question=[self.question.id], stdout=io.StringIO())
+        self.assertFalse(CounterShard.objects.exists())
+
+    def test_rebuild(self):
+        """Rebuilding counters from the vote table sees the shards as in sync, and clears them on repair."""
+        call_command('rebuild_vote_counts', check=True, stdout=io.StringIO())
+        CounterShard.objects.filter(choice=self.yes).update(count=0)
+        call_command('rebuild_vote_counts', stdout=io.StringIO())
+        self.assertFalse(CounterShard.objects.exists())
+        self.assertEqual(20, Choice.objects.get(pk=self.yes.pk).vote_count)
+
+    def test_admin_field(self):
+        """Shard count can be set in the question admin."""
+        User.objects.create_superuser(username="admin", password="HelloIamhere!")
+        self.client.login(username="admin", password="HelloIamhere!")
+        response = self.client.get(reverse('admin:polls_question_change', args=[self.question.id]))
+        self.assertContains(response, 'name="counter_shards"')
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertEqual(20, response.context['cl'].result_list[0].total)
+
+    def test_fewer_shards(self):
+        """Votes moved after the shards were lowered to one are taken from the choice counter."""
+        self.question.counter_shards = 1
+        self.question.save()
+        for user in self.users[:5]:
+            record_vote(user, self.question.choice_set.get(pk=self.no.pk))
+        self.assertEqual(-5, Choice.objects.get(pk=self.yes.pk).vote_count)
+        self.assertEqual([15, 5], get_tally(self.question).counts)
+        call_command('consolidate_vote_shards', stdout=io.StringIO())
+        self.assertEqual([15, 5], list(Choice.objects.order_by('pk').values_list('vote_count', flat=True)))
@@ -0,0 +1,110 @@
+"""Test the SQLite production profile, vote retries on lock errors and the multi-process stress test."""
+import contextlib
+import io
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from mysite.db import configure_sqlite
+from polls.models import Choice, Question, Vote
+from polls.voting import _record_vote, record_vote
+from .test_questions import create_question
+
+
+class SQLiteProfileTests(TransactionTestCase):
+    """Test for the pragmas set on new connections (outside a transaction, like a new connection)."""
+
+    def pragma(self, name):
+        """Read a pragma of the default connection."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRODUCTION=True, SQLITE_BUSY_TIMEOUT=1234, SQLITE_MMAP_SIZE=4 * 1024 * 1024,
+                       SQLITE_CACHE_SIZE=1000)
+    def test_production_pragmas(self):
+        """The profile turns on WAL, synchronous=NORMAL, the busy timeout, memory mapping and the cache size."""
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest("Needs a SQLite file database.")
+        journal_mode = self.pragma('journal_mode')
+        try:
+            configure_sqlite(connection=connection)
+            self.assertEqual('wal', self.pragma('journal_mode'))
+            self.assertEqual(1, self.pragma('synchronous'))
+            self.assertEqual(1234, self.pragma('busy_timeout'))
+            self.assertEqual(4 * 1024 * 1024, self.pragma('mmap_size'))
+            self.assertEqual(-1000, self.pragma('cache_size'))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+
+    def test_off_by_default(self):
+        """Without the profile, connections are left alone."""
+        with mock.patch.object(connection, 'connection') as raw:
+            configure_sqlite(connection=connection)
+        raw.execute.assert_not_called()
+
+
+class VoteRetryTests(TransactionTestCase):
+    """Test for retrying votes that lose a lock race."""
+
+    def setUp(self):
+        """Create a question with a choice and a voter."""
+        self.choice = Choice.objects.create(question=create_question(question_text="Q", days=-1), choice_text="A")
+        self.user = User.objects.create_user(username="voter")
+
+    def test_retry_lock_error(self):
+        """A vote that hits "database is locked" is run again."""
+        calls = []
+
+        def locked_once(user, choice):
+            calls.append(choice)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return _record_vote(user, choice)
+
+        with mock.patch('polls.voting._record_vote', side_effect=locked_once):
+            self.assertTrue(record_vote(self.user, self.choice))
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, Choice.objects.get(pk=self.choice.pk).vote_count)
+
+    @override_settings(POLLS_VOTE_LOCK_RETRIES=2)
+    def test_give_up(self):
+        """Lock errors are raised after the last retry, other errors at once."""
+        with mock.patch('polls.voting._record_vote', side_effect=OperationalError("database is locked")) as attempt:
+            with self.assertRaises(OperationalError):
+                record_vote(self.user, self.choice)
+        self.assertEqual(3, attempt.call_count)
+        with mock.patch('polls.voting._record_vote', side_effect=OperationalError("no such table")) as attempt:
+            with self.assertRaises(OperationalError):
+                record_vote(self.user, self.choice)
+        self.assertEqual(1, attempt.call_count)
+
+
+class StressVotesTests(TransactionTestCase):
+    """Test for the multi-process stress test command."""
+
+    def test_stress(self):
+        """Processes voting at once lose no vote under the production profile and leave no data behind."""
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest("Needs a SQLite file database.")
+        out = io.StringIO()
+        call_command('stress_votes', processes=3, votes=20, users=2, profiles=['production'], stdout=out)
+        self.assertIn("production: 60 votes", out.getvalue())
+        self.assertIn("0 failed", out.getvalue())
+        self.assertIn("Choice counters match the votes.", out.getvalue())
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(Vote.objects.exists())
+
+    def test_crashed_voters(self):
+        """Voters that crash still report, with the votes they did not cast as failed."""
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest("Needs a SQLite file database.")
+        out = io.StringIO()
+        # the forked voters inherit the patch, and print their traceback to the redirected stderr
+        with mock.patch('polls.management.commands.stress_votes.record_vote', side_effect=RuntimeError), \
+                contextlib.redirect_stderr(io.StringIO()):
+            call_command('stress_votes', processes=2, votes=5, users=1, profiles=['production'], stdout=out)
+        self.assertIn("production: 0 votes", out.getvalue())
+        self.assertIn("10 failed", out.getvalue())
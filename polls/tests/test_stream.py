@@ -0,0 +1,104 @@
+"""Test live results streamed as Server-Sent Events."""
+import json
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.models import Choice
+from polls.pubsub import CacheBroker, InProcessBroker
+from .test_questions import create_question
+
+
+def parse_event(chunk):
+    """Split an SSE message into its event name and decoded data."""
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines() if ': ' in line)
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+
+@override_settings(POLLS_LIVE_RESULTS=True, POLLS_STREAM_HEARTBEAT=0.05, POLLS_STREAM_MAX_SECONDS=5)
+class ResultsStreamTests(TestCase):
+    """Test for results stream endpoint."""
+
+    def setUp(self):
+        """Create a question with two choices and a logged in user."""
+        cache.clear()
+        self.question = create_question(question_text="Question1", days=0)
+        self.choice1 = Choice.objects.create(choice_text="1", question=self.question)
+        self.choice2 = Choice.objects.create(choice_text="2", question=self.question)
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.force_login(self.user)
+
+    def open_stream(self):
+        """Open the stream and return an iterator over its messages."""
+        response = self.client.get(reverse('polls:results_stream', kwargs={'pk': self.question.id}))
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        return iter(response.streaming_content)
+
+    def test_first_event_is_tally(self):
+        """Stream starts with the full tally."""
+        event, data = parse_event(next(self.open_stream()))
+        self.assertEqual('tally', event)
+        self.assertEqual(0, data['total'])
+        self.assertEqual(2, len(data['choices']))
+
+    def test_vote_sends_delta(self):
+        """A vote sends only the changed choice and the new total."""
+        stream = self.open_stream()
+        next(stream)
+        self.client.post(reverse('polls:vote', kwargs={'question_id': self.question.id}), {'choice': self.choice1.id})
+        event, data = parse_event(next(stream))
+        self.assertEqual('delta', event)
+        self.assertEqual({'total': 1, 'choices': {str(self.choice1.id): 1}}, data)
+
+    def test_heartbeat_without_votes(self):
+        """Without votes only keep-alive comments are sent."""
+        stream = self.open_stream()
+        next(stream)
+        self.assertEqual(b": keep-alive\n\n", next(stream))
+
+    def test_future_question(self):
+        """Unpublished question cannot be streamed."""
+        question = create_question(question_text="Question2", days=10)
+        response = self.client.get(reverse('polls:results_stream', kwargs={'pk': question.id}))
+        self.assertEqual(404, response.status_code)
+
+    def test_results_page_opens_stream(self):
+        """Results page subscribes to the stream."""
+        response = self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertContains(response, reverse('polls:results_stream', kwargs={'pk': self.question.id}))
+
+    @override_settings(POLLS_LIVE_RESULTS=False)
+    def test_turned_off(self):
+        """Without live results the page does not open a stream, and the stream is not served."""
+        response = self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertNotContains(response, "EventSource")
+        response = self.client.get(reverse('polls:results_stream', kwargs={'pk': self.question.id}))
+        self.assertEqual(404, response.status_code)
+
+    async def test_refused_under_asgi(self):
+        """Streams are not served by the ASGI handler, which would run their queries on the event loop."""
+        response = await self.async_client.get(reverse('polls:results_stream', kwargs={'pk': self.question.id}))
+        self.assertEqual(501, response.status_code)
+
+
+class BrokerTests(TestCase):
+    """Test publish/subscribe brokers."""
+
+    def test_in_process_broker(self):
+        """Subscribers of a channel receive its messages only."""
+        broker = InProcessBroker()
+        with broker.subscribe('question:1') as first, broker.subscribe('question:2') as second:
+            broker.publish('question:1', 5)
+            self.assertEqual(5, first.get(timeout=0.1))
+            self.assertIsNone(second.get(timeout=0.01))
+        broker.publish('question:1', 6)
+
+    def test_cache_broker(self):
+        """Cache broker reports the latest message published after subscribing."""
+        cache.clear()
+        broker = CacheBroker()
+        broker.poll_interval = 0.01
+        with broker.subscribe('question:1') as subscription:
+            self.assertIsNone(subscription.get(timeout=0.02))
+            broker.publish('question:1', 7)
+            self.assertEqual(7, subscription.get(timeout=0.1))
@@ -0,0 +1,103 @@
+"""Test for the vote tally service and results queries."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.cache import LOCK_KEY, bump_version, get_results, get_version
+from polls.models import Choice
+from polls.tally import get_tally
+from .test_questions import create_question
+
+
+class TallyTests(TestCase):
+    """Test tally values computed from stored counters."""
+
+    def setUp(self):
+        """Create a question with counted choices."""
+        cache.clear()
+        self.question = create_question(question_text="Question1", days=0)
+        Choice.objects.create(choice_text="1", question=self.question, vote_count=3)
+        Choice.objects.create(choice_text="2", question=self.question, vote_count=1)
+
+    def test_tally_values(self):
+        """Tally contains labels, counts, percentages and total."""
+        tally = get_tally(self.question)
+        self.assertEqual(["1", "2"], tally.labels)
+        self.assertEqual([3, 1], tally.counts)
+        self.assertEqual(4, tally.total)
+        self.assertEqual([75.0, 25.0], [row.percent for row in tally.rows])
+
+    def test_tally_without_votes(self):
+        """Percentages are zero when nobody voted."""
+        question = create_question(question_text="Question2", days=0)
+        Choice.objects.create(choice_text="1", question=question)
+        tally = get_tally(question)
+        self.assertEqual(0, tally.total)
+        self.assertEqual([0.0], [row.percent for row in tally.rows])
+
+    def test_results_json(self):
+        """JSON endpoint returns the same tally."""
+        response = self.client.get(reverse('polls:results_json', kwargs={'pk': self.question.id}))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(get_tally(self.question).as_dict(), response.json())
+
+    def test_results_json_future_question(self):
+        """Unpublished question has no JSON results."""
+        question = create_question(question_text="Question3", days=10)
+        response = self.client.get(reverse('polls:results_json', kwargs={'pk': question.id}))
+        self.assertEqual(404, response.status_code)
+
+
+class TallyQueryCountTests(TestCase):
+    """Test that counting does not depend on the number of choices."""
+
+    def setUp(self):
+        """Start from an empty results cache."""
+        cache.clear()
+
+    def test_tally_is_one_query(self):
+        """Tally and results page use a fixed number of queries at 5, 50 and 500 choices."""
+        for size in (5, 50, 500):
+            question = create_question(question_text=f"Question {size}", days=0)
+            Choice.objects.bulk_create(Choice(choice_text=str(i), question=question) for i in range(size))
+            with self.assertNumQueries(1):
+                self.assertEqual(size, len(get_tally(question).rows))
+            with self.assertNumQueries(2):
+                self.client.get(reverse('polls:results', kwargs={'pk': question.id}))
+
+
+class ResultsCacheTests(TestCase):
+    """Test the read-through results cache."""
+
+    def setUp(self):
+        """Create a question and start from an empty cache."""
+        cache.clear()
+        self.question = create_question(question_text="Question1", days=0)
+        self.choice = Choice.objects.create(choice_text="1", question=self.question)
+
+    def test_cached_until_version_bump(self):
+        """Cached tally is reused until the question version is bumped."""
+        get_results(self.question)
+        Choice.objects.filter(pk=self.choice.pk).update(vote_count=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(0, get_results(self.question).total)
+        bump_version(self.question.id)
+        self.assertEqual(1, get_results(self.question).total)
+
+    @override_settings(POLLS_RESULTS_STALE_TIMEOUT=30)
+    def test_stale_served_while_recomputing(self):
+        """While another request holds the recompute lock the stale tally is served."""
+        get_results(self.question)
+        bump_version(self.question.id)
+        cache.add(LOCK_KEY.format(self.question.id), True, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(0, get_results(self.question).total)
+
+    def test_vote_bumps_version(self):
+        """Voting makes the cached results stale."""
+        user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        self.client.force_login(user)
+        version = get_version(self.question.id)
+        self.client.post(reverse('polls:vote', kwargs={'question_id': self.question.id}), {'choice': self.choice.id})
+        self.assertNotEqual(version, get_version(self.question.id))
+        self.assertEqual(1, get_results(self.question).total)
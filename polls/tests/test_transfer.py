@@ -0,0 +1,102 @@
+"""Test streaming import and export of polls."""
+import io
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase
+from polls.models import Choice, Question, Vote
+from polls.transfer import export_polls, import_polls, read_csv, read_jsonl, write_csv, write_jsonl
+from .test_questions import create_question
+
+
+class TransferTests(TestCase):
+    """Test for export and import of polls."""
+
+    def setUp(self):
+        """Create two polls, one with a vote, and one poll without choices."""
+        self.question = create_question(question_text="Favourite, \"quoted\" colour?", days=-1, end_day=5)
+        red = Choice.objects.create(question=self.question, choice_text="Red")
+        Choice.objects.create(question=self.question, choice_text="Blue")
+        Vote.objects.create(choice=red, user=User.objects.create_user(username="voter", password="HelloIamhere!"))
+        other = create_question(question_text="Tea or coffee?", days=-2)
+        Choice.objects.create(question=other, choice_text="Tea")
+        create_question(question_text="Empty poll", days=-3)
+
+    def test_export_tallies(self):
+        """Export has every question with its choices and counted votes, across chunks."""
+        records = list(export_polls(chunk_size=2))
+        self.assertEqual(3, len(records))
+        self.assertEqual([{'choice_text': "Red", 'votes': 1}, {'choice_text': "Blue", 'votes': 0}],
+                         records[0]['choices'])
+        self.assertIsNone(records[1]['end_date'])
+        self.assertEqual([], records[2]['choices'])
+
+    def round_trip(self, write, read):
+        """Export, delete and import again, then compare."""
+        before = list(export_polls())
+        buffer = io.StringIO()
+        write(before, buffer)
+        Question.objects.all().delete()
+        buffer.seek(0)
+        self.assertEqual((3, 3), import_polls(read(buffer), batch_size=2))
+        after = list(export_polls())
+        for old, new in zip(before, after):
+            self.assertEqual(old['question_text'], new['question_text'])
+            self.assertEqual(old['pub_date'], new['pub_date'])
+            self.assertEqual(old['end_date'], new['end_date'])
+            self.assertEqual([choice['choice_text'] for choice in old['choices']],
+                             [choice['choice_text'] for choice in new['choices']])
+        self.assertEqual(0, Choice.objects.filter(vote_count__gt=0).count())
+
+    def test_jsonl_round_trip(self):
+        """Polls survive JSON Lines export and import, without their votes."""
+        self.round_trip(write_jsonl, read_jsonl)
+
+    def test_csv_round_trip(self):
+        """Polls survive CSV export and import, without their votes."""
+        self.round_trip(write_csv, read_csv)
+
+    def test_import_query_count(self):
+        """A batch costs the same few queries whatever its size."""
+        records = [{'question_text': f"Q{i}", 'pub_date': "2021-09-05T08:45:17Z",
+                    'choices': [{'choice_text': "A"}, {'choice_text': "B"}]} for i in range(100)]
+        with self.assertNumQueries(7):
+            import_polls(records, batch_size=100)
+        self.assertEqual(200, Choice.objects.filter(question__question_text__startswith="Q").count())
+
+    def test_commands(self):
+        """Commands write and read files in the format of their extension."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'polls.csv')
+            call_command('export_polls', path)
+            with open(path) as file:
+                self.assertTrue(file.readline().startswith('question,question_text'))
+            out = io.StringIO()
+            call_command('import_polls', path, stdout=out)
+        self.assertIn("Imported 3 question(s) with 3 choice(s).", out.getvalue())
+        self.assertEqual(6, Question.objects.count())
+
+    def test_invalid_record(self):
+        """A poll without publication date is rejected."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'polls.jsonl')
+            with open(path, 'w') as file:
+                file.write('{"question_text": "Q"}\n')
+            with self.assertRaises(CommandError):
+                call_command('import_polls', path)
+
+    def test_keys_taken_meanwhile(self):
+        """An import whose new keys cannot be matched to its polls is rolled back."""
+        def racing_insert(questions):
+            create_question(question_text="Other writer", days=0)
+            return Question.objects.get_queryset().bulk_create(questions)
+
+        records = [{'question_text': "Q", 'pub_date': "2021-09-05T08:45:17Z", 'choices': [{'choice_text': "A"}]}]
+        with mock.patch.object(Question.objects, 'bulk_create', side_effect=racing_insert):
+            with self.assertRaises(IntegrityError):
+                import_polls(records)
+        self.assertFalse(Question.objects.filter(question_text__in=["Q", "Other writer"]).exists())
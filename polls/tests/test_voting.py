@@ -1,6 +1,11 @@
 """Test for voting poll."""
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
 from django.test import TestCase
-from polls.models import Choice
+from polls.cache import get_results
+from polls.models import Choice, CounterShard, Vote
 from django.urls import reverse
 from .test_questions import create_question
 from django.contrib.auth.models import User
@@ -76,3 +81,87 @@ class QuestionVoteTests(TestCase):
         response = self.client.post(reverse('polls:vote', kwargs={'question_id': self.ended_question.id}),
                                     {'choice': choice1.id})
         self.assertEqual(response.status_code, 302)
+
+    def test_change_vote_moves_count(self):
+        """Changing a vote moves the stored count from the old choice to the new one."""
+        choice1 = Choice.objects.create(choice_text="1", question=self.recent_question)
+        choice2 = Choice.objects.create(choice_text="2", question=self.recent_question)
+        url = reverse('polls:vote', kwargs={'question_id': self.recent_question.id})
+        self.client.post(url, {'choice': choice1.id})
+        self.client.post(url, {'choice': choice2.id})
+        self.assertEqual(0, Choice.objects.get(id=choice1.id).votes)
+        self.assertEqual(1, Choice.objects.get(id=choice2.id).votes)
+        self.assertEqual(1, Vote.objects.filter(user=self.user1).count())
+
+    def test_vote_same_choice_twice(self):
+        """Voting the same choice again does not increase the count."""
+        choice1 = Choice.objects.create(choice_text="1", question=self.recent_question)
+        url = reverse('polls:vote', kwargs={'question_id': self.recent_question.id})
+        self.client.post(url, {'choice': choice1.id})
+        self.client.post(url, {'choice': choice1.id})
+        self.assertEqual(1, Choice.objects.get(id=choice1.id).votes)
+
+    def test_deleted_user_votes_leave_tally(self):
+        """Deleting a voter takes their vote off the counter and refreshes the cached results."""
+        choice1 = Choice.objects.create(choice_text="1", question=self.recent_question)
+        url = reverse('polls:vote', kwargs={'question_id': self.recent_question.id})
+        self.client.post(url, {'choice': choice1.id})
+        self.assertEqual([1], get_results(self.recent_question).counts)
+        self.user1.delete()
+        self.assertEqual(0, Choice.objects.get(id=choice1.id).votes)
+        self.assertEqual([0], get_results(self.recent_question).counts)
+
+    def test_deleted_question_with_shards(self):
+        """Deleting a sharded question with votes leaves no counter rows behind."""
+        self.recent_question.counter_shards = 4
+        self.recent_question.save()
+        choice1 = Choice.objects.create(choice_text="1", question=self.recent_question)
+        url = reverse('polls:vote', kwargs={'question_id': self.recent_question.id})
+        self.client.post(url, {'choice': choice1.id})
+        self.recent_question.delete()
+        self.assertFalse(CounterShard.objects.exists())
+
+
+class RebuildVoteCountsTests(TestCase):
+    """Test for rebuild_vote_counts management command."""
+
+    def setUp(self):
+        """Create a choice whose stored counter has drifted."""
+        self.question = create_question(question_text="Question1", days=0)
+        self.choice = Choice.objects.create(choice_text="1", question=self.question, vote_count=5)
+        user = User.objects.create_user(username="voter", password="HelloIamhere!")
+        Vote.objects.create(choice=self.choice, user=user)
+
+    def test_check_reports_drift(self):
+        """With --check the command fails and leaves the counter untouched."""
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+        self.assertEqual(5, Choice.objects.get(id=self.choice.id).vote_count)
+
+    def test_rebuild_repairs_drift(self):
+        """Rebuilding sets the counter to the number of Vote rows."""
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertEqual(1, Choice.objects.get(id=self.choice.id).vote_count)
+        call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+
+
+class VoteModelTests(TestCase):
+    """Test constraints of Vote model."""
+
+    def setUp(self):
+        """Create a question with two choices and a user."""
+        self.question = create_question(question_text="Question1", days=0)
+        self.choice1 = Choice.objects.create(choice_text="1", question=self.question)
+        self.choice2 = Choice.objects.create(choice_text="2", question=self.question)
+        self.user = User.objects.create_user(username="voter", password="HelloIamhere!")
+
+    def test_question_copied_from_choice(self):
+        """Saving a vote stores the question of its choice."""
+        vote = Vote.objects.create(choice=self.choice1, user=self.user)
+        self.assertEqual(self.question.id, vote.question_id)
+
+    def test_one_vote_per_user_and_question(self):
+        """A second vote row for the same user and question is rejected by the database."""
+        Vote.objects.create(choice=self.choice1, user=self.user)
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(choice=self.choice2, user=self.user)
@@ -0,0 +1,10 @@
+"""URL configuration that serves the polls app with its async views."""
+from django.urls import include, path
+from mysite import views
+from polls.urls import build_urlpatterns
+
+urlpatterns = [
+    path('accounts/', include('django.contrib.auth.urls')),
+    path('signup/', views.signup, name="signup"),
+    path('', include((build_urlpatterns(use_async=True), 'polls'), namespace="polls")),
+]
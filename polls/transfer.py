@@ -0,0 +1,163 @@
+"""Module contains streaming import and export of polls as JSON Lines or CSV.
+
+Both directions work on chunks of questions, so memory use does not grow with
+the size of the dump. A poll is one record: the question fields and its list of
+choices, each with the number of votes it received.
+
+* JSON Lines has one poll per line.
+* CSV has one choice per row, and the rows of a poll are consecutive and share
+  the ``question`` column.
+
+Vote counts are written on export and ignored on import: votes belong to users,
+so an imported poll starts with no votes.
+"""
+import csv
+import itertools
+import json
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .cache import bump_index_generation
+from .models import Choice, Question
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ('question', 'question_text', 'pub_date', 'end_date', 'choice_text', 'votes')
+
+
+def _chunks(iterable, size: int):
+    """Split ``iterable`` into lists of at most ``size`` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _format_date(value):
+    """Write a date as ISO 8601, or None."""
+    return value.isoformat() if value is not None else None
+
+
+def _parse_date(value):
+    """Read an ISO 8601 date, naive dates are in the current time zone."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value!r}")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def export_polls(queryset=None, chunk_size: int = 1000):
+    """Yield one record per question of ``queryset``, in primary key order.
+
+    Questions are read ``chunk_size`` at a time by primary key range, and the
+    choices of a chunk come from one query that counts their votes.
+    """
+    queryset = (queryset if queryset is not None else Question.objects.all()).order_by('pk')
+    last = 0
+    while True:
+        questions = list(queryset.filter(pk__gt=last).values('pk', 'question_text', 'pub_date', 'end_date')
+                         [:chunk_size])
+        if not questions:
+            return
+        choices = {question['pk']: [] for question in questions}
+        for question_id, text, votes in Choice.objects.filter(question_id__in=choices).order_by('question_id', 'pk')\
+                .annotate(votes=Count('vote')).values_list('question_id', 'choice_text', 'votes'):
+            choices[question_id].append({'choice_text': text, 'votes': votes})
+        for question in questions:
+            yield {
+                'question': question['pk'],
+                'question_text': question['question_text'],
+                'pub_date': _format_date(question['pub_date']),
+                'end_date': _format_date(question['end_date']),
+                'choices': choices[question['pk']],
+            }
+        last = questions[-1]['pk']
+
+
+def write_jsonl(records, file):
+    """Write records to ``file``, one JSON object per line."""
+    for record in records:
+        file.write(json.dumps(record) + '\n')
+
+
+def write_csv(records, file):
+    """Write records to ``file``, one row per choice (a poll without choices gets one row without choice)."""
+    writer = csv.DictWriter(file, CSV_FIELDS)
+    writer.writeheader()
+    for record in records:
+        poll = {name: record[name] for name in ('question', 'question_text', 'pub_date', 'end_date')}
+        for choice in record['choices'] or [{'choice_text': '', 'votes': ''}]:
+            writer.writerow(dict(poll, **choice))
+
+
+def read_jsonl(file):
+    """Read records written by ``write_jsonl``, skipping blank lines."""
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise ValueError(f"Line {number}: {error}")
+
+
+def read_csv(file):
+    """Read records written by ``write_csv``, joining consecutive rows of the same question."""
+    rows = csv.DictReader(file)
+    for _, group in itertools.groupby(rows, key=lambda row: (row.get('question'), row['question_text'])):
+        group = list(group)
+        yield {
+            'question_text': group[0]['question_text'],
+            'pub_date': group[0]['pub_date'],
+            'end_date': group[0]['end_date'],
+            'choices': [{'choice_text': row['choice_text']} for row in group if row['choice_text']],
+        }
+
+
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv}
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def _create_questions(questions: list) -> list:
+    """Insert ``questions`` and return their primary keys, in the same order."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [question.pk for question in Question.objects.bulk_create(questions)]
+    # Backends such as SQLite do not return the new keys; they follow the highest key inside this transaction.
+    # Keys are not set here, as the database would reuse those of deleted questions still in the cache.
+    last = Question.objects.aggregate(last=Max('pk'))['last'] or 0
+    Question.objects.bulk_create(questions)
+    ids = list(Question.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+    if len(ids) != len(questions):
+        # another writer added questions meanwhile, so the keys cannot be matched to the polls
+        raise IntegrityError(f"Inserted {len(questions)} questions but found {len(ids)} new keys.")
+    return ids
+
+
+def import_polls(records, batch_size: int = 1000) -> tuple:
+    """Create the polls of ``records`` and return ``(questions, choices)`` created.
+
+    Each batch of ``batch_size`` polls is one transaction with two inserts: the
+    questions, then all their choices with the new question keys. An invalid
+    record raises ``ValueError``; batches before it stay imported.
+    """
+    created_questions = created_choices = 0
+    for batch in _chunks(records, batch_size):
+        questions = []
+        for record in batch:
+            if not record.get('question_text') or not record.get('pub_date'):
+                raise ValueError(f"Poll needs question_text and pub_date: {record!r}")
+            questions.append(Question(question_text=record['question_text'], pub_date=_parse_date(record['pub_date']),
+                                      end_date=_parse_date(record.get('end_date'))))
+        with transaction.atomic():
+            question_ids = _create_questions(questions)
+            choices = [Choice(question_id=question_id, choice_text=choice['choice_text'])
+                       for question_id, record in zip(question_ids, batch) for choice in record.get('choices', [])]
+            Choice.objects.bulk_create(choices, batch_size)
+        created_questions += len(questions)
+        created_choices += len(choices)
+    if created_questions:
+        bump_index_generation()
+    return created_questions, created_choices
@@ -1,15 +1,37 @@
 """Module contains all url for polls app."""
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, exports, views
 
 app_name = 'polls'
-urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    # 127.0.0.1/polls/
-    path('<int:question_id>/', views.detail, name="detail"),
-    # 127.0.0.1/polls/1
-    path('<int:pk>/results', views.ResultsView.as_view(), name="results"),
-    # 127.0.0.1/polls/1/results
-    path('<int:question_id>/vote', views.vote, name="vote"),
-    # 127.0.0.1/polls/1/vote
-]
+
+
+def build_urlpatterns(use_async=False):
+    """Build url patterns with sync views (WSGI) or their async variants (ASGI)."""
+    return [
+        path('', async_views.index if use_async else views.IndexView.as_view(), name='index'),
+        # 127.0.0.1/polls/
+        path('<int:question_id>/', async_views.detail if use_async else views.detail, name="detail"),
+        # 127.0.0.1/polls/1
+        path('<int:pk>/results', async_views.results if use_async else views.ResultsView.as_view(), name="results"),
+        # 127.0.0.1/polls/1/results
+        path('<int:pk>/results.json', api.poll_results, name="results_json"),
+        # 127.0.0.1/polls/1/results.json
+        path('<int:pk>/results/stream', views.results_stream, name="results_stream"),
+        # 127.0.0.1/polls/1/results/stream
+        path('<int:question_id>/vote', async_views.vote if use_async else views.vote, name="vote"),
+        # 127.0.0.1/polls/1/vote
+        path('api/polls/', api.poll_list, name="api_polls"),
+        # 127.0.0.1/polls/api/polls/
+        path('api/polls/<int:pk>/', api.poll_detail, name="api_poll"),
+        # 127.0.0.1/polls/api/polls/1/
+        path('api/polls/<int:pk>/results/', api.poll_results, name="api_results"),
+        # 127.0.0.1/polls/api/polls/1/results/
+        path('export/votes.csv', exports.votes_csv, name="export_votes"),
+        # 127.0.0.1/polls/export/votes.csv
+        path('export/results.csv', exports.results_csv, name="export_results"),
+        # 127.0.0.1/polls/export/results.csv
+    ]
+
+
+urlpatterns = build_urlpatterns(getattr(settings, 'POLLS_ASYNC_VIEWS', False))
@@ -1,31 +1,66 @@
 """Module contains functions for link in polls app url to the page."""
-from django.shortcuts import render, get_object_or_404
-from .models import Question, Vote
-from django.http import HttpResponseRedirect, HttpResponseNotFound
+from django.shortcuts import get_object_or_404
+from .models import Question, QuestionStatus, Vote
+from .cache import (bump_version, cache_anonymous_page, get_results, get_index_generation, get_index_timeout,
+                    get_version, is_results_stale, skip_page_cache)
+from .pagination import KeysetPage, after_cursor, decode_cursor
+from .voting import record_vote
+from .ingest import enqueue_vote, get_ingestion_mode, get_last_flush
+from .pubsub import get_broker, question_channel, publish_results
+from django.conf import settings
+import datetime
+import json
+import time
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotFound, StreamingHttpResponse
+from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
-from itertools import chain
+from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
-import logging
+from mysite.audit import audit
 
 
+def results_page_version(pk):
+    """Get the version of a results page, which changes with its question's votes and choices."""
+    return get_version(pk)
+
+
+@method_decorator(cache_anonymous_page(get_index_generation, get_index_timeout, params=('after',)), name='dispatch')
 class IndexView(generic.ListView):
-    """Index page that shows list of all polls."""
+    """Index page that shows list of all polls, active polls first."""
 
     template_name = 'polls/index.html'
     context_object_name = 'latest_question'
 
+    def get(self, request, *args, **kwargs):
+        """Take one clock reading for the whole request."""
+        self.now = timezone.now()
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        """Return the published questions."""
-        questions = Question.objects.filter(pub_date__lte=timezone.now())\
-            .exclude(end_date__lte=timezone.now())\
-            .order_by('-pub_date')
-        ended_questions = Question.objects.filter(end_date__lte=timezone.now()).order_by('-pub_date')
-        result_list = list(chain(questions, ended_questions))
-        return result_list
+        """Return a lazy page of published questions, ended ones after the active ones."""
+        questions = Question.objects.published(self.now).order_by('status', '-pub_date', '-pk')
+        cursor = decode_cursor(self.request.GET.get('after'))
+        if cursor is not None:
+            questions = after_cursor(questions, cursor)
+        return KeysetPage(questions, settings.POLLS_INDEX_PAGE_SIZE)
+
+    def get_context_data(self, **kwargs):
+        """Add keys and timeout of the cached question list."""
+        context = super().get_context_data(**kwargs)
+        cursor = decode_cursor(self.request.GET.get('after'))
+        context['cursor'] = self.request.GET['after'] if cursor is not None else ''
+        if cursor is None and 'after' in self.request.GET:
+            # an invalid cursor shows the first page, which is cached under its own URL
+            skip_page_cache(self.request)
+        context['index_generation'] = get_index_generation()
+        context['index_timeout'] = get_index_timeout(self.now)
+        return context
 
 
+@method_decorator(cache_anonymous_page(results_page_version), name='dispatch')
 class ResultsView(generic.DetailView):
     """Result page that shows individual question."""
 
@@ -35,55 +70,112 @@ class ResultsView(generic.DetailView):
     def get_context_data(self, **kwargs):
         """Prepare data for visualisation in pie chart."""
         context = super().get_context_data(**kwargs)
-        q_id = context['question'].id
-        choice_set = Question.objects.get(pk=q_id).choice_set.all()
-        labels = []
-        data = []
-        for choice in choice_set:
-            data.append(choice.votes)
-            labels.append(choice.choice_text)
-        context['labels'] = labels
-        context['data'] = data
+        tally = get_results(self.object)
+        if is_results_stale(self.object.id):
+            # served while another request recomputes it, so not cached as the page of the new version
+            skip_page_cache(self.request)
+        context['tally'] = tally
+        context['labels'] = tally.labels
+        context['data'] = tally.counts
+        context['choice_ids'] = [row.choice_id for row in tally.rows]
+        context['live_results'] = settings.POLLS_LIVE_RESULTS
+        if get_ingestion_mode() != 'sync':
+            last_flush = get_last_flush(self.object.id)
+            context['last_flush'] = datetime.datetime.fromtimestamp(last_flush, datetime.timezone.utc) \
+                if last_flush else None
+            context['buffered'] = True
         return context
 
     def get_queryset(self):
         """Excludes any questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
+
+
+def served_by_asgi(request) -> bool:
+    """Tell whether the request came through the ASGI handler.
+
+    Django 3.2 iterates streaming responses on the event loop there, where
+    database queries are not allowed.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def results_stream(request, pk):
+    """Stream vote count changes of a published question as Server-Sent Events, when live results are on."""
+    if not settings.POLLS_LIVE_RESULTS:
+        return HttpResponseNotFound("Live results are turned off.")
+    if served_by_asgi(request):
+        return HttpResponse("Live results need the WSGI server.", status=501)
+    question = get_object_or_404(Question.objects.published(), pk=pk)
+    response = StreamingHttpResponse(results_events(question.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def results_events(question_id):
+    """Yield the current tally, then one event each time vote counts change.
+
+    The first event ``tally`` has the full tally. Each ``delta`` event only has
+    the choices whose count changed and the new total. A comment line is sent
+    when nothing happened for ``POLLS_STREAM_HEARTBEAT`` seconds, and the
+    stream ends after ``POLLS_STREAM_MAX_SECONDS`` (browsers reconnect on their own).
+    """
+    heartbeat = getattr(settings, 'POLLS_STREAM_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'POLLS_STREAM_MAX_SECONDS', 300)
+    with get_broker().subscribe(question_channel(question_id)) as subscription:
+        tally = get_results(question_id)
+        counts = {row.choice_id: row.votes for row in tally.rows}
+        yield f"retry: 3000\nevent: tally\ndata: {json.dumps(tally.as_dict())}\n\n"
+        while time.monotonic() < deadline:
+            if subscription.get(timeout=min(heartbeat, max(0, deadline - time.monotonic()))) is None:
+                yield ": keep-alive\n\n"
+                continue
+            tally = get_results(question_id)
+            changes = {row.choice_id: row.votes for row in tally.rows if counts.get(row.choice_id) != row.votes}
+            if changes:
+                counts.update(changes)
+                yield f"event: delta\ndata: {json.dumps({'total': tally.total, 'choices': changes})}\n\n"
+
+
+def get_detail_context(question, user) -> dict:
+    """Build details page context: choices and the user's current vote, one query each."""
+    choices = list(question.choice_set.order_by('pk'))
+    context = {"question": question, "choices": choices}
+    if user.is_authenticated:
+        voted_id = Vote.objects.filter(question=question, user=user).values_list('choice_id', flat=True).first()
+        context['voted'] = next((choice for choice in choices if choice.pk == voted_id), None)
+    return context
 
 
 def detail(request, question_id):
     """Render details page for individual question."""
-    question = get_object_or_404(Question, pk=question_id)
-    if question.pub_date > timezone.now():
+    question = get_object_or_404(Question.objects.with_status(), pk=question_id)
+    if question.status != QuestionStatus.OPEN:
         return HttpResponseNotFound("This poll cannot be voted.")
-    if question.end_date:
-        if question.end_date < timezone.now():
-            return HttpResponseNotFound("This poll cannot be voted.")
-    context = {"question": question}
-    if request.user.is_authenticated:
-        voted = Vote.objects.filter(choice__question=question, user=request.user)
-        if voted:
-            context['voted'] = voted[0].choice
-    return render(request, "polls/details.html", context)
+    return TemplateResponse(request, "polls/details.html", get_detail_context(question, request.user))
 
 
 @login_required(login_url='/accounts/login/')
 def vote(request, question_id):
     """Vote page that process vote privately and return to result page if success."""
-    question = get_object_or_404(Question, pk=question_id)
+    question = get_object_or_404(Question.objects.with_status(), pk=question_id)
     if not question.can_vote():
         return HttpResponseNotFound("This poll cannot be voted.")
     try:
         selected_choice = question.choice_set.get(pk=request.POST['choice'])
     except Exception:
-        return render(request, "polls/details.html", {'question': question, 'error_message': "Please select a choice"})
-    voted_before = Vote.objects.filter(choice__question=question, user=request.user)
-    if voted_before:
-        voted = voted_before[0]
-        voted.choice = selected_choice
-    else:
-        voted = Vote.objects.create(choice=selected_choice, user=request.user)
-    logger = logging.getLogger("polls")
-    logger.info(f"{request.user} votes for {selected_choice.choice_text} in {question.question_text}.")
-    voted.save()
+        context = get_detail_context(question, request.user)
+        context['error_message'] = "Please select a choice"
+        return TemplateResponse(request, "polls/details.html", context)
+    save_vote(request.user, question, selected_choice)
     return HttpResponseRedirect(reverse('polls:results', args=[question.id],))
+
+
+def save_vote(user, question, selected_choice):
+    """Record or queue the vote of ``user``, shared by the sync and async vote views."""
+    if get_ingestion_mode() != 'sync':
+        enqueue_vote(user, selected_choice)
+    elif record_vote(user, selected_choice):
+        publish_results(question.id, bump_version(question.id))
+    audit('vote', question=question.id, choice=selected_choice.id, user=user.pk)
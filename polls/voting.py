@@ -0,0 +1,78 @@
+"""Module contains the service that records votes and keeps choice counters in sync."""
+import random
+import time
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+from .models import Choice, CounterShard, Vote
+
+LOCK_ERROR_CODES = ('40001', '40P01')  # PostgreSQL serialization failure and deadlock
+
+
+def is_lock_error(error: OperationalError) -> bool:
+    """Check whether ``error`` means the transaction lost a lock race and can simply run again."""
+    return 'database is locked' in str(error) or getattr(error.__cause__, 'pgcode', None) in LOCK_ERROR_CODES
+
+
+def record_vote(user, choice) -> bool:
+    """Record a vote with ``_record_vote``, retrying up to ``POLLS_VOTE_LOCK_RETRIES`` times on lock errors.
+
+    Retries wait a random, doubling delay so that competing workers do not
+    collide again. Inside an outer transaction the error is raised at once,
+    because only the outer transaction can be run again.
+    """
+    retries = getattr(settings, 'POLLS_VOTE_LOCK_RETRIES', 5)
+    attempt = 0
+    while True:
+        try:
+            return _record_vote(user, choice)
+        except OperationalError as error:
+            if attempt >= retries or not is_lock_error(error) or transaction.get_connection().in_atomic_block:
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+
+
+def _record_vote(user, choice) -> bool:
+    """Record that ``user`` votes for ``choice``, replacing their earlier vote in the question.
+
+    The vote row is inserted first, like ``INSERT ... ON CONFLICT``. The insert
+    takes the write lock straight away, so two requests from the same user can
+    never both see "no vote" and both insert. When the unique constraint on
+    (user, question) rejects the insert, the existing row is read under that
+    lock and only updated if the choice changed.
+
+    Returns:
+        True if a vote was created or moved to another choice, False if the
+        user had already voted for ``choice``.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Vote.objects.create(choice=choice, question_id=choice.question_id, user=user)
+        except IntegrityError:
+            previous = Vote.objects.select_for_update()\
+                .filter(user=user, question_id=choice.question_id)\
+                .values_list('choice_id', flat=True).get()
+            if previous == choice.pk:
+                return False
+            Vote.objects.filter(user=user, question_id=choice.question_id).update(choice=choice)
+            add_votes(previous, choice.question.counter_shards, -1)
+        add_votes(choice.pk, choice.question.counter_shards, 1)
+    return True
+
+
+def add_votes(choice_id: int, shards: int, delta: int):
+    """Add ``delta`` to the counter of a choice, or to one of its ``shards`` counter rows picked at random."""
+    if shards <= 1:
+        Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + delta)
+        return
+    shard = random.randrange(shards)
+    if CounterShard.objects.filter(choice_id=choice_id, shard=shard).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            CounterShard.objects.create(choice_id=choice_id, shard=shard, count=delta)
+    except IntegrityError:
+        # Another vote created the shard first.
+        CounterShard.objects.filter(choice_id=choice_id, shard=shard).update(count=F('count') + delta)